@@ -0,0 +1,178 @@
+"""
+Adaptive batch sizing and timeouts for Telegram Bot Response Monitor.
+
+Instead of always sending ``MESSAGE_COUNT`` probes, each batch runs Wald's
+sequential probability ratio test (SPRT) on the share of bad probes (slow
+or unanswered). A batch stops as soon as the bot is clearly healthy or
+clearly degraded. The probes saved that way go into a shared budget that
+extends batches whose outcome is still uncertain. Reply timeouts follow
+each bot's own latency, estimated the way TCP estimates retransmission
+timeouts.
+"""
+
+import logging
+import math
+from typing import Dict, Optional
+
+from metrics import ProbeResult
+
+logger = logging.getLogger("BotMonitor")
+
+# Error rates of the sequential test (false "degraded", false "healthy")
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+# Reply dates have one-second resolution, the clock granularity G of RFC 6298
+CLOCK_GRANULARITY = 1.0
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+UNDECIDED = "undecided"
+
+
+class SequentialBatch:
+    """SPRT state for the probes of one batch against one bot."""
+
+    def __init__(
+        self,
+        bot: str,
+        base_probes: int,
+        min_probes: int,
+        healthy_bad_rate: float,
+        degraded_bad_rate: float,
+        early_stop: bool = True,
+    ):
+        self.bot = bot
+        self.early_stop = early_stop
+        self.base_probes = base_probes
+        self.min_probes = min_probes
+        self.limit = base_probes
+        self.sent = 0
+        self.bad = 0
+        self.llr = 0.0
+        self.decision = UNDECIDED
+        self._bad_step = math.log(degraded_bad_rate / healthy_bad_rate)
+        self._good_step = math.log((1 - degraded_bad_rate) / (1 - healthy_bad_rate))
+        self._upper = math.log((1 - SPRT_BETA) / SPRT_ALPHA)
+        self._lower = math.log(SPRT_BETA / (1 - SPRT_ALPHA))
+
+    def record(self, result: ProbeResult):
+        """Update the test with one probe outcome."""
+        self.sent += 1
+        bad = result.timed_out or result.slow
+        self.bad += int(bad)
+        self.llr += self._bad_step if bad else self._good_step
+
+        if not self.early_stop or self.sent < self.min_probes:
+            return
+        if self.llr >= self._upper:
+            self.decision = DEGRADED
+        elif self.llr <= self._lower:
+            self.decision = HEALTHY
+
+    def should_continue(self) -> bool:
+        """True while the batch has neither a decision nor exhausted its limit."""
+        return self.decision == UNDECIDED and self.sent < self.limit
+
+
+class AdaptiveTimeout:
+    """Per-bot reply timeout from smoothed latency and its variation (RFC 6298)."""
+
+    def __init__(self, initial: float, minimum: float, maximum: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.timeout = min(max(initial, minimum), maximum)
+
+    def record(self, latency: Optional[float]):
+        """Fold a reply latency in, or back off after a missed reply."""
+        if latency is None:
+            self.timeout = min(self.timeout * 2, self.maximum)
+            return
+        if self.srtt is None:
+            self.srtt = latency
+            self.rttvar = latency / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - latency)
+            self.srtt = 0.875 * self.srtt + 0.125 * latency
+        # Whole-second latencies often repeat exactly and collapse rttvar, so
+        # the variation term never drops below the clock granularity
+        rto = self.srtt + max(CLOCK_GRANULARITY, 4 * self.rttvar)
+        self.timeout = min(max(rto, self.minimum), self.maximum)
+
+
+class AdaptiveBatchController:
+    """Hands out per-bot batches and timeouts and manages the shared probe budget."""
+
+    def __init__(
+        self,
+        base_probes: int,
+        min_probes: int = 5,
+        healthy_bad_rate: float = 0.05,
+        degraded_bad_rate: float = 0.5,
+        max_wait: float = 10.0,
+        min_wait: float = 2.0,
+        early_stop: bool = True,
+        adaptive_timeouts: bool = True,
+    ):
+        self.base_probes = base_probes
+        self.early_stop = early_stop
+        self.min_probes = min(min_probes, base_probes)
+        self.healthy_bad_rate = healthy_bad_rate
+        self.degraded_bad_rate = degraded_bad_rate
+        self.max_wait = max_wait
+        self.min_wait = min(min_wait, max_wait)
+        self.adaptive_timeouts = adaptive_timeouts
+        self.spare_probes = 0
+        self.max_spare_probes = base_probes * 5
+        self.timeouts: Dict[str, AdaptiveTimeout] = {}
+        self.last_batches: Dict[str, SequentialBatch] = {}
+
+    def start_batch(self, bot: str) -> SequentialBatch:
+        """Begin a new batch for ``bot``."""
+        batch = SequentialBatch(
+            bot,
+            self.base_probes,
+            self.min_probes,
+            self.healthy_bad_rate,
+            self.degraded_bad_rate,
+            self.early_stop,
+        )
+        self.last_batches[bot] = batch
+        return batch
+
+    def extend(self, batch: SequentialBatch) -> bool:
+        """Spend one spare probe on an undecided batch that reached its limit."""
+        if batch.decision != UNDECIDED or batch.sent < batch.limit:
+            return False
+        if self.spare_probes <= 0 or batch.limit >= batch.base_probes * 2:
+            return False
+        self.spare_probes -= 1
+        batch.limit += 1
+        return True
+
+    def finish_batch(self, batch: SequentialBatch):
+        """Return probes an early decision saved to the shared budget."""
+        saved = max(0, batch.base_probes - batch.sent) if batch.decision != UNDECIDED else 0
+        self.spare_probes = min(self.spare_probes + saved, self.max_spare_probes)
+        logger.info(
+            f"🎯 [{batch.bot}] Batch verdict: {batch.decision} after {batch.sent} probes "
+            f"({batch.bad} bad), spare probe budget: {self.spare_probes}"
+        )
+
+    def timeout_for(self, bot: str) -> float:
+        """Current reply timeout for ``bot``."""
+        if not self.adaptive_timeouts:
+            return self.max_wait
+        return self._timeout(bot).timeout
+
+    def record(self, batch: SequentialBatch, result: ProbeResult):
+        """Update both the batch test and the bot's timeout with a probe outcome."""
+        batch.record(result)
+        if self.adaptive_timeouts:
+            self._timeout(result.bot).record(result.latency)
+
+    def _timeout(self, bot: str) -> AdaptiveTimeout:
+        if bot not in self.timeouts:
+            self.timeouts[bot] = AdaptiveTimeout(self.max_wait, self.min_wait, self.max_wait)
+        return self.timeouts[bot]
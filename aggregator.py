@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Central aggregator for Telegram Bot Response Monitor
+Collects batched probe results from monitors running at several network
+locations (vantage points) and serves merged per-vantage and global views.
+
+Agents and the aggregator talk over a plain TCP connection using
+length-prefixed, zlib-compressed JSON frames. Each agent batch carries
+mergeable per-minute histograms plus a capped list of raw samples, and is
+acknowledged before the next one is sent, so a slow aggregator pushes back
+on agents instead of growing their memory.
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import logging
+import os
+import struct
+import sys
+import time
+import uuid
+import zlib
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from histogram import LatencyHistogram
+from metrics import ProbeResult
+
+logger = logging.getLogger("BotMonitor")
+
+DEFAULT_PORT = 8765
+# Upper bounds on a single frame, compressed and decompressed, protect the
+# aggregator from bad peers
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+FRAME_HEADER = struct.Struct("!I")
+BUCKET_SECONDS = 60
+# Histograms an agent batch may hold before its buckets are widened, a day of
+# minutes for one bot
+MAX_BATCH_BUCKETS = 1440
+
+
+async def write_frame(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    """Send one message and wait until the transport has room for more."""
+    payload = zlib.compress(json.dumps(message, separators=(",", ":")).encode())
+    writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """Read one message; raises IncompleteReadError when the peer disconnects."""
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds limit of {MAX_FRAME_BYTES}")
+    payload = await reader.readexactly(length)
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(payload, MAX_DECOMPRESSED_BYTES)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Frame expands beyond limit of {MAX_DECOMPRESSED_BYTES} bytes")
+    if not decompressor.eof:
+        raise ValueError("Frame holds a truncated zlib stream")
+    message = json.loads(data)
+    if not isinstance(message, dict):
+        raise ValueError("Frame does not hold a JSON object")
+    return message
+
+
+class AgentBatch:
+    """Per-bot, per-minute histograms and capped raw samples awaiting shipment.
+
+    When the batch would hold more than ``max_buckets`` histograms, as during
+    a long aggregator outage, the bucket width doubles and neighbouring
+    histograms are merged, so memory stays bounded and no probe is lost.
+    """
+
+    def __init__(self, max_samples: int, max_buckets: int = MAX_BATCH_BUCKETS):
+        self.max_buckets = max_buckets
+        self.bucket_seconds = BUCKET_SECONDS
+        self.histograms: Dict[str, Dict[int, LatencyHistogram]] = {}
+        self.samples: Deque[Tuple[float, str, Optional[float]]] = deque(maxlen=max_samples)
+        self.dropped_samples = 0
+        self._bucket_count = 0
+
+    def __len__(self) -> int:
+        return sum(h.count + h.timeouts for buckets in self.histograms.values() for h in buckets.values())
+
+    def add(self, result: ProbeResult):
+        bucket = int(result.timestamp // self.bucket_seconds) * self.bucket_seconds
+        buckets = self.histograms.setdefault(result.bot, {})
+        if bucket not in buckets:
+            buckets[bucket] = LatencyHistogram()
+            self._bucket_count += 1
+        buckets[bucket].add(result.latency)
+        if len(self.samples) == self.samples.maxlen:
+            self.dropped_samples += 1
+        self.samples.append((result.timestamp, result.bot, result.latency))
+        while self._bucket_count > self.max_buckets and self.bucket_seconds < 86400:
+            self._widen()
+
+    def _widen(self):
+        self.bucket_seconds *= 2
+        self._bucket_count = 0
+        for bot, buckets in self.histograms.items():
+            widened: Dict[int, LatencyHistogram] = {}
+            for bucket, histogram in buckets.items():
+                start = bucket // self.bucket_seconds * self.bucket_seconds
+                if start in widened:
+                    widened[start].merge(histogram)
+                else:
+                    widened[start] = histogram
+            self.histograms[bot] = widened
+            self._bucket_count += len(widened)
+
+    def to_message(self, vantage: str, session: str, seq: int) -> Dict[str, Any]:
+        return {
+            "type": "batch",
+            "vantage": vantage,
+            "session": session,
+            "seq": seq,
+            "bucket_seconds": self.bucket_seconds,
+            "histograms": {
+                bot: {str(bucket): h.to_dict() for bucket, h in buckets.items()}
+                for bot, buckets in self.histograms.items()
+            },
+            "samples": list(self.samples),
+            "dropped_samples": self.dropped_samples,
+        }
+
+
+class AgentShipper:
+    """Ships probe results from a monitor to the aggregator in the background.
+
+    ``submit`` never blocks the probe loop. Results accumulate in a batch
+    that is flushed every ``flush_seconds``, one batch in flight at a time.
+    While the aggregator is slow or unreachable the next batch keeps
+    growing: its histograms keep every probe, in coarser buckets once an
+    outage outlasts ``max_buckets`` minutes, and only the oldest raw
+    samples are dropped. A batch is resent with the same sequence number
+    until acknowledged, so the aggregator can discard duplicates.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        vantage: str,
+        flush_seconds: float = 10.0,
+        max_samples: int = 1000,
+        ack_timeout: float = 30.0,
+        token: str = "",
+        max_buckets: int = MAX_BATCH_BUCKETS,
+    ):
+        self.host = host
+        self.port = port
+        self.vantage = vantage
+        self.token = token
+        self.flush_seconds = flush_seconds
+        self.max_samples = max_samples
+        self.max_buckets = max_buckets
+        self.ack_timeout = ack_timeout
+        self._current = AgentBatch(max_samples, max_buckets)
+        self._pending: Optional[AgentBatch] = None
+        self._session = uuid.uuid4().hex
+        self._seq = 0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry_delay = 1.0
+
+    def submit(self, result: ProbeResult):
+        """Queue a probe result for the next shipment."""
+        self._current.add(result)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"📡 Agent '{self.vantage}' shipping results to {self.host}:{self.port}")
+
+    async def stop(self):
+        """Try one final flush, then stop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=5)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f"⚠️ Final shipment to aggregator failed: {e}")
+        self._close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+                self._retry_delay = 1.0
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning(f"⚠️ Aggregator unavailable ({e}), retrying in {self._retry_delay:.0f}s")
+                self._close()
+                await asyncio.sleep(self._retry_delay)
+                self._retry_delay = min(self._retry_delay * 2, 60.0)
+
+    async def flush(self):
+        """Send buffered results, waiting for the aggregator to acknowledge each batch."""
+        while self._pending is not None or len(self._current):
+            if self._pending is None:
+                self._pending = self._current
+                self._current = AgentBatch(self.max_samples, self.max_buckets)
+                self._seq += 1
+
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            message = self._pending.to_message(self.vantage, self._session, self._seq)
+            message["token"] = self.token
+            await write_frame(self._writer, message)
+            reply = await asyncio.wait_for(read_frame(self._reader), timeout=self.ack_timeout)
+            if reply.get("type") != "ack" or reply.get("seq") != self._seq:
+                raise ValueError(f"unexpected reply from aggregator: {reply.get('message', reply.get('type'))}")
+            self._pending = None
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+def summarize(histogram: LatencyHistogram) -> Dict[str, Any]:
+    return {
+        "probes": histogram.count + histogram.timeouts,
+        "timeouts": histogram.timeouts,
+        "p50": histogram.percentile(50),
+        "p95": histogram.percentile(95),
+        "p99": histogram.percentile(99),
+    }
+
+
+def parse_batch(message: Dict[str, Any]) -> Tuple[
+    str, str, int, int, Dict[Tuple[str, int], LatencyHistogram], List[Tuple[float, str, Optional[float]]], int
+]:
+    """Validate an agent batch; raises ValueError when a field is missing or malformed."""
+    try:
+        vantage, session, seq = message["vantage"], message["session"], message["seq"]
+        if not isinstance(vantage, str) or not isinstance(session, str):
+            raise ValueError("vantage and session must be strings")
+        if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+            raise ValueError("seq must be a positive integer")
+        bucket_seconds = message.get("bucket_seconds", BUCKET_SECONDS)
+        if (not isinstance(bucket_seconds, int) or isinstance(bucket_seconds, bool)
+                or bucket_seconds < BUCKET_SECONDS or bucket_seconds % BUCKET_SECONDS):
+            raise ValueError("bucket_seconds must be a positive multiple of a minute")
+        histograms = {}
+        for bot, buckets in message["histograms"].items():
+            for bucket, data in buckets.items():
+                histograms[(str(bot), int(bucket))] = LatencyHistogram.from_dict(data)
+        samples = []
+        for timestamp, bot, latency in message.get("samples", []):
+            samples.append((float(timestamp), str(bot), None if latency is None else float(latency)))
+        dropped_samples = int(message.get("dropped_samples", 0))
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"malformed batch: {e!r}") from e
+    return vantage, session, seq, bucket_seconds, histograms, samples, dropped_samples
+
+
+class Aggregator:
+    """Merges agent batches into per-vantage, per-bot, per-minute histograms."""
+
+    def __init__(self, retention_hours: float = 24.0, max_samples: int = 100000, token: str = ""):
+        self.token = token
+        self.retention_seconds = retention_hours * 3600
+        self.buckets: Dict[Tuple[str, str, int], LatencyHistogram] = {}
+        # Width of buckets wider than a minute, from agents that were cut off for long
+        self.bucket_seconds: Dict[Tuple[str, str, int], int] = {}
+        self.samples: Deque[Tuple[str, float, str, Optional[float]]] = deque(maxlen=max_samples)
+        self.last_seen: Dict[str, float] = {}
+        self.dropped_samples: Dict[str, int] = {}
+        self.last_seq: Dict[Tuple[str, str], int] = {}
+
+    def merge(self, message: Dict[str, Any]) -> bool:
+        """Fold one agent batch into the aggregate state; False for a resent duplicate.
+
+        The whole batch is validated before anything is merged, so a
+        malformed batch raises ValueError and leaves the state untouched.
+        """
+        vantage, session, seq, bucket_seconds, histograms, samples, dropped_samples = parse_batch(message)
+        agent = (vantage, session)
+        if seq <= self.last_seq.get(agent, 0):
+            return False
+        for (bot, bucket), histogram in histograms.items():
+            key = (vantage, bot, bucket)
+            if key in self.buckets:
+                self.buckets[key].merge(histogram)
+            else:
+                self.buckets[key] = histogram
+            if bucket_seconds > self.bucket_seconds.get(key, BUCKET_SECONDS):
+                self.bucket_seconds[key] = bucket_seconds
+        for timestamp, bot, latency in samples:
+            self.samples.append((vantage, timestamp, bot, latency))
+        self.dropped_samples[vantage] = self.dropped_samples.get(vantage, 0) + dropped_samples
+        self.last_seen[vantage] = time.time()
+        # Only a fully merged batch counts as received, so a failed one is accepted on resend
+        self.last_seq[agent] = seq
+        return True
+
+    def authorized(self, message: Dict[str, Any]) -> bool:
+        """True when no token is configured or the message carries the right one."""
+        token = message.get("token", "")
+        return not self.token or (isinstance(token, str) and hmac.compare_digest(token, self.token))
+
+    def evict(self, now: Optional[float] = None):
+        cutoff = (time.time() if now is None else now) - self.retention_seconds
+        for key in [key for key in self.buckets if key[2] < cutoff]:
+            del self.buckets[key]
+            self.bucket_seconds.pop(key, None)
+
+    def view(self, window_minutes: float = 60) -> Dict[str, Any]:
+        """Per-vantage and global per-bot summaries over the last ``window_minutes``."""
+        since = time.time() - window_minutes * 60
+        per_vantage: Dict[str, Dict[str, LatencyHistogram]] = {}
+        overall: Dict[str, LatencyHistogram] = {}
+        for key, histogram in self.buckets.items():
+            vantage, bot, bucket = key
+            if bucket + self.bucket_seconds.get(key, BUCKET_SECONDS) < since:
+                continue
+            per_vantage.setdefault(vantage, {}).setdefault(bot, LatencyHistogram()).merge(histogram)
+            overall.setdefault(bot, LatencyHistogram()).merge(histogram)
+        return {
+            "window_minutes": window_minutes,
+            "vantages": {
+                vantage: {
+                    "last_seen": self.last_seen.get(vantage),
+                    "dropped_samples": self.dropped_samples.get(vantage, 0),
+                    "bots": {bot: summarize(h) for bot, h in bots.items()},
+                }
+                for vantage, bots in per_vantage.items()
+            },
+            "global": {bot: summarize(h) for bot, h in overall.items()},
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                message = await read_frame(reader)
+                if not self.authorized(message):
+                    await write_frame(writer, {"type": "error", "message": "invalid token"})
+                    logger.warning(f"⚠️ Rejected message with invalid token from {peer}")
+                    break
+                if message.get("type") == "batch":
+                    self.merge(message)
+                    await write_frame(writer, {"type": "ack", "seq": message["seq"]})
+                elif message.get("type") == "query":
+                    window_minutes = message.get("window_minutes", 60)
+                    if not isinstance(window_minutes, (int, float)):
+                        raise ValueError("window_minutes must be a number")
+                    await write_frame(writer, {"type": "view", **self.view(window_minutes)})
+                else:
+                    await write_frame(writer, {"type": "error", "message": "unknown message type"})
+        except asyncio.IncompleteReadError:
+            pass
+        except (OSError, ValueError, TypeError, zlib.error) as e:
+            logger.warning(f"⚠️ Dropping connection from {peer}: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info(f"📡 Aggregator listening on {host}:{port}")
+        async with server:
+            while True:
+                await asyncio.sleep(60)
+                self.evict()
+
+
+async def query(host: str, port: int, window_minutes: float, token: str = "") -> Dict[str, Any]:
+    """Fetch the merged view from a running aggregator."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        await write_frame(writer, {"type": "query", "window_minutes": window_minutes, "token": token})
+        reply = await read_frame(reader)
+        if reply.get("type") != "view":
+            raise ValueError(f"aggregator refused the query: {reply.get('message', reply.get('type'))}")
+        return reply
+    finally:
+        writer.close()
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_view(view: Dict[str, Any]):
+    """Print global and per-vantage tables."""
+    def table(title: str, bots: Dict[str, Any]):
+        print(f"\n{title}")
+        print(f"{'bot':<24} {'probes':>7} {'no reply':>8} {'p50':>6} {'p95':>6} {'p99':>6}")
+        for bot, s in sorted(bots.items()):
+            print(
+                f"{bot:<24} {s['probes']:>7} {s['timeouts']:>8} {format_seconds(s['p50']):>6} "
+                f"{format_seconds(s['p95']):>6} {format_seconds(s['p99']):>6}"
+            )
+
+    print(f"📊 Last {view['window_minutes']:g} minutes")
+    if not view["global"]:
+        print("📭 No results received yet.")
+        return
+    table("🌍 Global", view["global"])
+    for vantage, data in sorted(view["vantages"].items()):
+        table(f"📍 {vantage} (dropped samples: {data['dropped_samples']})", data["bots"])
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Aggregate bot latency results from several monitor agents.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    serve = subcommands.add_parser("serve", help="Run the aggregator")
+    serve.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for remote agents)")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--retention-hours", type=float, default=24)
+    report = subcommands.add_parser("report", help="Print the merged view of a running aggregator")
+    report.add_argument("--host", default="127.0.0.1")
+    report.add_argument("--port", type=int, default=DEFAULT_PORT)
+    report.add_argument("--minutes", type=float, default=60)
+    report.add_argument("--json", action="store_true", help="Print raw JSON")
+    for subcommand in (serve, report):
+        subcommand.add_argument(
+            "--token", default=os.getenv("AGGREGATOR_TOKEN", ""), help="Shared secret agents must present"
+        )
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+        try:
+            if args.host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+                logger.warning("⚠️ Listening on a public interface without --token, anyone can submit results")
+            asyncio.run(Aggregator(args.retention_hours, token=args.token).serve(args.host, args.port))
+        except KeyboardInterrupt:
+            logger.info("🛑 Aggregator stopped")
+    else:
+        try:
+            view = asyncio.run(query(args.host, args.port, args.minutes, args.token))
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if args.json:
+            print(json.dumps(view, indent=2))
+        else:
+            print_view(view)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""
+Alert dispatching for Telegram Bot Response Monitor.
+
+Probe results and anomalies are queued without blocking the probe loop.
+A background task groups them per bot into fixed time windows and turns
+each window into a state (ok, slow or down). Notifications are only sent
+when a bot's state changes and the new state has held for a number of
+windows. Bots that keep changing state are reported once as flapping and
+then muted until they settle. Alerts go to pluggable async sinks (local
+file, webhook, Telegram Bot API) with retries.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from anomaly import Anomaly
+from metrics import ProbeResult
+
+logger = logging.getLogger("BotMonitor")
+
+OK = "ok"
+SLOW = "slow"
+DOWN = "down"
+FLAPPING = "flapping"
+ANOMALY = "anomaly"
+
+STATE_ICONS = {OK: "🟢", SLOW: "🟡", DOWN: "🔴", FLAPPING: "🔁", ANOMALY: "📈"}
+
+# Longest text the Bot API accepts in one message, in UTF-16 code units
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+
+@dataclass
+class Alert:
+    """One notification about a bot."""
+
+    bot: str
+    state: str
+    previous_state: str
+    summary: str
+    window_start: float
+    window_end: float
+
+    def text(self) -> str:
+        start = datetime.fromtimestamp(self.window_start).strftime("%H:%M:%S")
+        end = datetime.fromtimestamp(self.window_end).strftime("%H:%M:%S")
+        return f"{STATE_ICONS.get(self.state, '⚠️')} {self.bot} {self.state.upper()}: {self.summary} ({start}-{end})"
+
+
+class DeliveryRejected(Exception):
+    """The destination refused the alerts; retrying will not help."""
+
+
+class AlertSink(ABC):
+    """Base class for alert destinations."""
+
+    name = "sink"
+
+    @abstractmethod
+    async def send(self, alerts: List[Alert]):
+        """Deliver alerts; raise DeliveryRejected for errors that retries cannot fix."""
+
+    async def close(self):
+        pass
+
+
+class FileSink(AlertSink):
+    """Appends alerts as JSON lines to a local file, off the event loop."""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"alerts-{self.name}")
+
+    async def send(self, alerts: List[Alert]):
+        lines = "".join(json.dumps(asdict(alert)) + "\n" for alert in alerts)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._append, lines)
+
+    def _append(self, lines: str):
+        with open(self.path, "a") as f:
+            f.write(lines)
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class WebhookSink(AlertSink):
+    """POSTs alerts as JSON over a kept-alive HTTP(S) connection.
+
+    http.client is blocking, so requests run on a single dedicated worker
+    thread that owns the connection and reuses it between deliveries.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._host = parts.netloc
+        self._path = parts.path or "/"
+        if parts.query:
+            self._path += f"?{parts.query}"
+        self._connection = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"alerts-{self.name}")
+
+    def payloads(self, alerts: List[Alert]) -> List[dict]:
+        """Request bodies to POST for ``alerts``, in order."""
+        return [{"alerts": [asdict(alert) for alert in alerts]}]
+
+    async def send(self, alerts: List[Alert]):
+        loop = asyncio.get_running_loop()
+        for payload in self.payloads(alerts):
+            await loop.run_in_executor(self._executor, self._post, json.dumps(payload).encode())
+
+    def _post(self, body: bytes):
+        if self._connection is None:
+            connection_class = HTTPSConnection if self._https else HTTPConnection
+            self._connection = connection_class(self._host, timeout=self.timeout)
+        try:
+            self._connection.request("POST", self._path, body, {"Content-Type": "application/json"})
+            response = self._connection.getresponse()
+            response.read()
+        except (OSError, HTTPException):
+            self._connection.close()
+            self._connection = None
+            raise
+        # Client errors (bad token, chat id or URL) won't go away on retry, rate limits will
+        if 400 <= response.status < 500 and response.status != 429:
+            raise DeliveryRejected(f"{self.name} returned HTTP {response.status}")
+        if response.status >= 300:
+            raise HTTPException(f"{self.name} returned HTTP {response.status}")
+
+    async def close(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._executor.shutdown(wait=False)
+
+
+def text_length(text: str) -> int:
+    """Length of ``text`` as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def split_message(lines: List[str], limit: int = TELEGRAM_MAX_MESSAGE_LENGTH) -> List[str]:
+    """Pack lines into as few messages of at most ``limit`` as possible.
+
+    A line that is too long on its own is cut into several messages.
+    """
+    messages: List[str] = []
+    current = ""
+    for line in lines:
+        while text_length(line) > limit:
+            # Characters are one or two code units, so dropping half the
+            # excess in characters converges in a step or two
+            cut = limit
+            while text_length(line[:cut]) > limit:
+                cut -= (text_length(line[:cut]) - limit + 1) // 2
+            if current:
+                messages.append(current)
+                current = ""
+            messages.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if text_length(candidate) > limit:
+            messages.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        messages.append(current)
+    return messages
+
+
+class TelegramSink(WebhookSink):
+    """Sends alerts as Telegram messages through the Bot API.
+
+    Alerts are packed into as few messages as the Bot API length limit
+    allows; a retry after a partly delivered batch resends all of them.
+    """
+
+    name = "telegram"
+
+    def __init__(self, bot_token: str, chat_id: str, timeout: float = 10.0):
+        super().__init__(f"https://api.telegram.org/bot{bot_token}/sendMessage", timeout)
+        self.chat_id = chat_id
+
+    def payloads(self, alerts: List[Alert]) -> List[dict]:
+        return [{"chat_id": self.chat_id, "text": text} for text in split_message([alert.text() for alert in alerts])]
+
+
+class BotAlertState:
+    """Confirmed state, pending change and recent transitions of one bot."""
+
+    def __init__(self):
+        self.state = OK
+        self.candidate: Optional[str] = None
+        self.candidate_windows = 0
+        self.transitions: Deque[float] = deque()
+        self.flapping = False
+
+
+class AlertDispatcher:
+    """Groups probe events per bot and window and delivers state changes to sinks."""
+
+    def __init__(
+        self,
+        sinks: List[AlertSink],
+        window_seconds: float = 60.0,
+        confirm_windows: int = 2,
+        flap_threshold: int = 4,
+        flap_window_seconds: float = 3600.0,
+        slow_ratio: float = 0.5,
+        down_ratio: float = 0.8,
+        max_retries: int = 3,
+        queue_size: int = 10000,
+    ):
+        self.sinks = sinks
+        self.window_seconds = window_seconds
+        self.confirm_windows = confirm_windows
+        self.flap_threshold = flap_threshold
+        self.flap_window_seconds = flap_window_seconds
+        self.slow_ratio = slow_ratio
+        self.down_ratio = down_ratio
+        self.max_retries = max_retries
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.states: Dict[str, BotAlertState] = {}
+        self.dropped_events = 0
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: set = set()
+        self._window_start = time.time()
+
+    def observe(self, result: ProbeResult):
+        """Queue a probe result; never blocks."""
+        self._put(("probe", result))
+
+    def anomaly(self, anomaly: Anomaly):
+        """Queue a detected anomaly; never blocks."""
+        self._put(("anomaly", anomaly))
+
+    def _put(self, event: Tuple[str, object]):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped_events += 1
+
+    def start(self):
+        if self._task is None:
+            self._window_start = time.time()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🔔 Alerting via {', '.join(sink.name for sink in self.sinks)}")
+
+    async def stop(self):
+        """Evaluate the final window, wait briefly for deliveries and close sinks."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._evaluate_window()
+        if self._deliveries:
+            await asyncio.wait(self._deliveries, timeout=10)
+        for sink in self.sinks:
+            await sink.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            self._evaluate_window()
+
+    def _evaluate_window(self):
+        window_start, window_end = self._window_start, time.time()
+        self._window_start = window_end
+
+        counts: Dict[str, List[int]] = {}
+        anomalies: Dict[Tuple[str, str], Anomaly] = {}
+        while not self.queue.empty():
+            kind, event = self.queue.get_nowait()
+            if kind == "probe":
+                probes = counts.setdefault(event.bot, [0, 0, 0])
+                probes[0] += 1
+                probes[1] += int(event.slow)
+                probes[2] += int(event.timed_out)
+            else:
+                anomalies.setdefault((event.bot, event.kind), event)
+
+        alerts = []
+        for bot, (probes, slow, timeouts) in counts.items():
+            alert = self._update_state(bot, probes, slow, timeouts, window_start, window_end)
+            if alert:
+                alerts.append(alert)
+        for (bot, _), anomaly in anomalies.items():
+            state = self.states.get(bot)
+            if state and (state.flapping or state.state == DOWN):
+                continue
+            alerts.append(Alert(bot, ANOMALY, state.state if state else OK, anomaly.description,
+                                window_start, window_end))
+
+        if self.dropped_events:
+            logger.warning(f"⚠️ Alert queue full, dropped {self.dropped_events} events")
+            self.dropped_events = 0
+        if alerts:
+            task = asyncio.ensure_future(self._deliver(alerts))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    def _window_state(self, probes: int, slow: int, timeouts: int) -> str:
+        if timeouts >= probes * self.down_ratio:
+            return DOWN
+        if slow + timeouts >= probes * self.slow_ratio:
+            return SLOW
+        return OK
+
+    def _update_state(
+        self, bot: str, probes: int, slow: int, timeouts: int, window_start: float, window_end: float
+    ) -> Optional[Alert]:
+        state = self.states.setdefault(bot, BotAlertState())
+        observed = self._window_state(probes, slow, timeouts)
+        summary = f"{timeouts} unanswered and {slow} slow out of {probes} probes"
+
+        while state.transitions and state.transitions[0] < window_end - self.flap_window_seconds:
+            state.transitions.popleft()
+        if state.flapping and not state.transitions:
+            state.flapping = False
+            state.state = observed
+            return Alert(bot, observed, FLAPPING, f"stable again - {summary}", window_start, window_end)
+
+        if observed == state.state:
+            state.candidate, state.candidate_windows = None, 0
+            return None
+        if observed == state.candidate:
+            state.candidate_windows += 1
+        else:
+            state.candidate, state.candidate_windows = observed, 1
+        if state.candidate_windows < self.confirm_windows:
+            return None
+
+        previous = state.state
+        state.state = observed
+        state.candidate, state.candidate_windows = None, 0
+        state.transitions.append(window_end)
+        if state.flapping:
+            return None
+        if len(state.transitions) >= self.flap_threshold:
+            state.flapping = True
+            return Alert(
+                bot, FLAPPING, previous,
+                f"{len(state.transitions)} state changes within {self.flap_window_seconds / 60:.0f} minutes, "
+                f"muting until stable",
+                window_start, window_end,
+            )
+        return Alert(bot, observed, previous, summary, window_start, window_end)
+
+    async def _deliver(self, alerts: List[Alert]):
+        for alert in alerts:
+            logger.info(f"🔔 {alert.text()}")
+        await asyncio.gather(*(self._deliver_to(sink, alerts) for sink in self.sinks))
+
+    async def _deliver_to(self, sink: AlertSink, alerts: List[Alert]):
+        for attempt in range(self.max_retries):
+            try:
+                await sink.send(alerts)
+                return
+            except DeliveryRejected as e:
+                logger.error(f"❌ {sink.name} rejected {len(alerts)} alert(s), not retrying: {e}")
+                return
+            except Exception as e:
+                if attempt + 1 == self.max_retries:
+                    logger.error(f"❌ Could not deliver {len(alerts)} alert(s) via {sink.name}: {e}")
+                    return
+                await asyncio.sleep(2 ** attempt)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Log analysis utility for Telegram Bot Response Monitor
+Streams bot_response_times.log history and reports per-bot, per-hour
+latency percentiles, optionally converting it into a compact columnar store.
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from histogram import LatencyHistogram
+
+# Matches the probe lines written by res_bot.py, e.g.
+# 2025-07-03 19:41:54,123 - INFO - ⚡ [@bot] Fast response time: 0.85s
+# 2025-07-03 19:42:03,456 - WARNING - 🐌 [@bot] Slow response (6.12s) for message 'xY7nQ2vF'
+# 2025-07-03 19:42:15,789 - WARNING - ❌ [@bot] No response within 10s for message 'aB3kM9pL'
+LINE_PATTERN = re.compile(
+    rb"^(\d{4}-\d\d-\d\d) (\d\d):(\d\d):(\d\d)[,.](\d{3}) - \w+ - [^\[\n]*\[(@[^\]\n]+)\] "
+    rb"(?:Fast response time: (\d+(?:\.\d+)?)s|Slow response \((\d+(?:\.\d+)?)s\)|No response within)",
+    re.MULTILINE,
+)
+
+DEFAULT_LOG_GLOB = "bot_response_times.log*"
+DEFAULT_CHUNK_MB = 64
+PERCENTILES = (50, 90, 95, 99)
+
+HourKey = Tuple[str, str]
+Task = Tuple[str, int, int, Optional[str]]
+
+
+def plan_chunks(path: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split a file into byte ranges that start and end on line boundaries."""
+    if path.endswith(".gz"):
+        return [(0, -1)]
+
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def iter_matches(path: str, start: int, end: int) -> Iterator[Tuple[bytes, ...]]:
+    """Yield the groups of probe lines in a byte range without reading it into memory."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            for line in f:
+                match = LINE_PATTERN.match(line)
+                if match:
+                    yield match.groups()
+        return
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # groups() copies the matched bytes, so no buffer export outlives the mmap
+            match = None
+            matches = LINE_PATTERN.finditer(mm, start, end)
+            for match in matches:
+                yield match.groups()
+            del match, matches
+
+
+class ColumnWriter:
+    """Collects one chunk's probes as typed columns and writes them as a part."""
+
+    def __init__(self):
+        self.bots: Dict[str, int] = {}
+        self.timestamps = array("q")
+        self.bot_ids = array("H")
+        self.latencies = array("f")
+
+    def add(self, timestamp_ms: int, bot: str, latency: Optional[float]):
+        bot_id = self.bots.setdefault(bot, len(self.bots))
+        self.timestamps.append(timestamp_ms)
+        self.bot_ids.append(bot_id)
+        self.latencies.append(math.nan if latency is None else latency)
+
+    def write(self, part_dir: str) -> int:
+        os.makedirs(part_dir, exist_ok=True)
+        for name, column in (("timestamp_ms.i64", self.timestamps),
+                             ("bot.u16", self.bot_ids),
+                             ("latency.f32", self.latencies)):
+            with open(os.path.join(part_dir, name), "wb") as f:
+                column.tofile(f)
+        with open(os.path.join(part_dir, "bots.json"), "w") as f:
+            json.dump(sorted(self.bots, key=self.bots.get), f)
+        return len(self.timestamps)
+
+
+def scan_chunk(task: Task) -> Tuple[Dict[HourKey, LatencyHistogram], int]:
+    """Build per-bot, per-hour histograms for one byte range of a log file."""
+    path, start, end, part_dir = task
+    histograms: Dict[HourKey, LatencyHistogram] = {}
+    writer = ColumnWriter() if part_dir else None
+    midnights: Dict[bytes, float] = {}
+    rows = 0
+
+    for groups in iter_matches(path, start, end):
+        day, hour, minute, second, millis, bot, fast, slow = groups
+        latency_text = fast or slow
+        latency = float(latency_text) if latency_text else None
+        bot_name = bot.decode("utf-8", "replace")
+
+        key = (bot_name, f"{day.decode()} {hour.decode()}:00")
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = LatencyHistogram()
+        histogram.add(latency)
+
+        if writer:
+            midnight = midnights.get(day)
+            if midnight is None:
+                midnight = midnights[day] = time.mktime(time.strptime(day.decode(), "%Y-%m-%d"))
+            seconds = midnight + int(hour) * 3600 + int(minute) * 60 + int(second)
+            writer.add(int(seconds * 1000) + int(millis), bot_name, latency)
+
+    if writer:
+        rows = writer.write(part_dir)
+    return histograms, rows
+
+
+def analyze(
+    paths: List[str],
+    workers: int,
+    chunk_size: int,
+    columnar_dir: Optional[str] = None,
+) -> Dict[HourKey, LatencyHistogram]:
+    """Scan all log files in parallel and merge the per-hour histograms."""
+    tasks: List[Task] = []
+    for file_index, path in enumerate(paths):
+        for chunk_index, (start, end) in enumerate(plan_chunks(path, chunk_size)):
+            part_dir = None
+            if columnar_dir:
+                part_dir = os.path.join(columnar_dir, f"part-{file_index:04d}-{chunk_index:05d}")
+            tasks.append((path, start, end, part_dir))
+
+    merged: Dict[HourKey, LatencyHistogram] = {}
+    parts = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for task, (histograms, rows) in zip(tasks, executor.map(scan_chunk, tasks)):
+            for key, histogram in histograms.items():
+                if key in merged:
+                    merged[key].merge(histogram)
+                else:
+                    merged[key] = histogram
+            if task[3]:
+                parts.append({"path": os.path.basename(task[3]), "rows": rows, "source": task[0]})
+
+    if columnar_dir:
+        write_manifest(columnar_dir, parts)
+    return merged
+
+
+def write_manifest(columnar_dir: str, parts: List[dict]):
+    """Describe the columnar store so it can be read back with read_columnar."""
+    manifest = {
+        "columns": {
+            "timestamp_ms": "i64 (array 'q'), milliseconds since the epoch",
+            "bot": "u16 (array 'H'), index into the part's bots.json",
+            "latency": "f32 (array 'f'), seconds, NaN for no response",
+        },
+        "byteorder": sys.byteorder,
+        "rows": sum(part["rows"] for part in parts),
+        "parts": parts,
+    }
+    with open(os.path.join(columnar_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def read_manifest(columnar_dir: str) -> dict:
+    """Load the manifest of a columnar store."""
+    with open(os.path.join(columnar_dir, "manifest.json")) as f:
+        return json.load(f)
+
+
+def read_part(columnar_dir: str, part: dict, byteorder: str) -> Iterator[Tuple[float, str, Optional[float]]]:
+    """Yield (timestamp, bot, latency) rows from one part of a columnar store."""
+    part_dir = os.path.join(columnar_dir, part["path"])
+    with open(os.path.join(part_dir, "bots.json")) as f:
+        bots = json.load(f)
+    columns = []
+    for name, typecode in (("timestamp_ms.i64", "q"), ("bot.u16", "H"), ("latency.f32", "f")):
+        column = array(typecode)
+        with open(os.path.join(part_dir, name), "rb") as f:
+            column.fromfile(f, part["rows"])
+        if byteorder != sys.byteorder:
+            column.byteswap()
+        columns.append(column)
+    for timestamp_ms, bot_id, latency in zip(*columns):
+        yield timestamp_ms / 1000, bots[bot_id], None if math.isnan(latency) else latency
+
+
+def read_columnar(columnar_dir: str) -> Iterator[Tuple[float, str, Optional[float]]]:
+    """Yield (timestamp, bot, latency) rows from a columnar store."""
+    manifest = read_manifest(columnar_dir)
+    for part in manifest["parts"]:
+        yield from read_part(columnar_dir, part, manifest["byteorder"])
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def print_tables(histograms: Dict[HourKey, LatencyHistogram], bot_filter: Optional[str]):
+    """Print a per-hour percentile table for each bot."""
+    bots = sorted({bot for bot, _ in histograms})
+    if bot_filter:
+        bots = [bot for bot in bots if bot == bot_filter]
+    if not bots:
+        print("📭 No probe results found.")
+        return
+
+    header = f"{'hour':<17} {'probes':>7} {'no reply':>8} " + " ".join(f"{'p' + str(q):>6}" for q in PERCENTILES) + f" {'max':>6}"
+    for bot in bots:
+        print(f"\n🤖 {bot}")
+        print(header)
+        print("-" * len(header))
+        total = LatencyHistogram()
+        for (_, hour), histogram in sorted((key, h) for key, h in histograms.items() if key[0] == bot):
+            total.merge(histogram)
+            print(format_row(hour, histogram))
+        print("-" * len(header))
+        print(format_row("all", total))
+
+
+def format_row(label: str, histogram: LatencyHistogram) -> str:
+    percentiles = " ".join(f"{format_seconds(histogram.percentile(q)):>6}" for q in PERCENTILES)
+    return (
+        f"{label:<17} {histogram.count + histogram.timeouts:>7} {histogram.timeouts:>8} "
+        f"{percentiles} {format_seconds(histogram.maximum):>6}"
+    )
+
+
+def print_csv(histograms: Dict[HourKey, LatencyHistogram], bot_filter: Optional[str]):
+    """Print the per-bot, per-hour table as CSV."""
+    print("bot,hour,probes,no_reply," + ",".join(f"p{q}" for q in PERCENTILES) + ",max")
+    for (bot, hour), histogram in sorted(histograms.items()):
+        if bot_filter and bot != bot_filter:
+            continue
+        values = [histogram.percentile(q) for q in PERCENTILES] + [histogram.maximum]
+        cells = ",".join("" if value is None else f"{value:.3f}" for value in values)
+        print(f"{bot},{hour},{histogram.count + histogram.timeouts},{histogram.timeouts},{cells}")
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Per-bot, per-hour latency percentiles from bot_response_times.log history."
+    )
+    parser.add_argument("paths", nargs="*", help=f"Log files, plain or .gz (default: {DEFAULT_LOG_GLOB})")
+    parser.add_argument("--bot", help="Only report this bot (e.g. @mybot)")
+    parser.add_argument("--csv", action="store_true", help="Print CSV instead of tables")
+    parser.add_argument("--columnar", metavar="DIR", help="Also convert the history into a columnar store in DIR")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parallel worker processes")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_MB, help="Chunk size per worker task in MB")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(DEFAULT_LOG_GLOB))
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        print(f"❌ File not found: {', '.join(missing)}")
+        sys.exit(1)
+    if not paths:
+        print(f"📭 No log files matching {DEFAULT_LOG_GLOB} found.")
+        sys.exit(1)
+
+    bot_filter = args.bot
+    if bot_filter and not bot_filter.startswith("@"):
+        bot_filter = f"@{bot_filter}"
+
+    started = time.perf_counter()
+    histograms = analyze(paths, args.workers, args.chunk_mb * 1024 * 1024, args.columnar)
+    elapsed = time.perf_counter() - started
+
+    if args.csv:
+        print_csv(histograms, bot_filter)
+    else:
+        print(f"📊 Analyzed {len(paths)} file(s) in {elapsed:.1f}s")
+        print_tables(histograms, bot_filter)
+        if args.columnar:
+            print(f"\n💾 Columnar store written to {args.columnar}")
+
+
+if __name__ == "__main__":
+    main()
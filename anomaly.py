@@ -0,0 +1,271 @@
+"""
+Streaming latency anomaly detection for Telegram Bot Response Monitor.
+
+Each bot gets a detector that learns its own latency baseline online and
+fires when recent latency regresses against it, instead of relying on the
+single static ``RESPONSE_THRESHOLD_SECONDS``. Memory per bot is constant:
+EWMA mean/variance and an exponentially weighted p95 for the whole history
+and for each hour of the day, a small ring buffer of recent samples and a
+CUSUM accumulator for change-point detection.
+"""
+
+import logging
+import math
+import statistics
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional
+
+from metrics import ProbeResult
+
+logger = logging.getLogger("BotMonitor")
+
+# Latencies are compared in log space; clamp to avoid log(0) on 1s-resolution dates
+MIN_LATENCY = 0.05
+# Smallest standard deviation used when standardising samples
+MIN_STD = 0.05
+# Largest standardised deviation a single sample contributes to the CUSUM
+MAX_Z = 3.0
+# Message dates have one-second resolution, so smaller latency changes are noise
+DATE_RESOLUTION = 1.0
+
+
+@dataclass
+class Anomaly:
+    """A detected latency regression for one bot."""
+
+    bot: str
+    kind: str
+    description: str
+    recent_p95: float
+    baseline_p95: float
+
+
+def binomial_tail(n: int, p: float, k: int) -> float:
+    """Probability of at least ``k`` successes in ``n`` trials of probability ``p``."""
+    return sum(math.comb(n, i) * p ** i * (1 - p) ** (n - i) for i in range(k, n + 1))
+
+
+def nearest_rank(values: Iterable[float], q: float) -> float:
+    """Nearest-rank percentile ``q`` (0-100) of a non-empty collection."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class LatencyBaseline:
+    """EWMA mean/variance and exponentially weighted p95 of log latency.
+
+    The first ``1 / alpha`` samples are kept and the estimates computed
+    exactly from them; only then does the baseline switch to constant-memory
+    exponential updates, so it never starts from a single sample.
+    """
+
+    def __init__(self, alpha: float = 0.02, quantile_step: float = 0.02):
+        self.alpha = alpha
+        self.quantile_step = quantile_step
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.p95 = 0.0
+        self._samples: Optional[List[float]] = []
+
+    @property
+    def exact_samples(self) -> int:
+        """Number of samples estimated exactly before switching to EWMA."""
+        return math.ceil(1 / self.alpha)
+
+    def seed(self, other: "LatencyBaseline"):
+        """Start from another baseline's estimates (used for hourly slots)."""
+        self.mean = other.mean
+        self.var = other.var
+        self.p95 = other.p95
+        self._samples = None
+
+    def update(self, value: float):
+        """Fold one log-latency sample into the baseline."""
+        self.count += 1
+        if self._samples is not None:
+            self._samples.append(value)
+            self.mean = statistics.fmean(self._samples)
+            self.var = statistics.pvariance(self._samples, self.mean)
+            self.p95 = nearest_rank(self._samples, 95)
+            if len(self._samples) >= self.exact_samples:
+                self._samples = None
+            return
+
+        delta = value - self.mean
+        self.mean += self.alpha * delta
+        self.var = (1 - self.alpha) * (self.var + self.alpha * delta * delta)
+        # Stochastic-approximation quantile, settles where P(x > q) = 5%. The
+        # step follows the spread so it neither crawls nor jitters.
+        step = self.quantile_step * self.std
+        if value > self.p95:
+            self.p95 += step * 0.95
+        else:
+            self.p95 -= step * 0.05
+
+    @property
+    def std(self) -> float:
+        return max(math.sqrt(self.var), MIN_STD)
+
+
+class LatencyAnomalyDetector:
+    """Online p95-regression and change-point detector for a single bot."""
+
+    def __init__(
+        self,
+        bot: str,
+        timeout_value: float = 10.0,
+        p95_ratio: float = 1.5,
+        min_delta: float = DATE_RESOLUTION,
+        warmup: int = 50,
+        recent_window: int = 50,
+        min_hour_samples: int = 20,
+        cusum_slack: float = 0.5,
+        cusum_threshold: float = 10.0,
+        significance: float = 0.001,
+    ):
+        self.bot = bot
+        self.timeout_value = timeout_value
+        self.p95_ratio = p95_ratio
+        self.min_delta = min_delta
+        self.warmup = warmup
+        self.min_hour_samples = min_hour_samples
+        self.cusum_slack = cusum_slack
+        self.cusum_threshold = cusum_threshold
+        # Fewest recent samples above the baseline p95 that a stable bot
+        # produces with probability below ``significance``
+        self.min_exceedances = next(
+            k for k in range(1, recent_window + 1)
+            if binomial_tail(recent_window, 0.05, k) < significance
+        )
+        self.overall = LatencyBaseline()
+        self.hourly: List[LatencyBaseline] = [LatencyBaseline() for _ in range(24)]
+        self.recent: Deque[float] = deque(maxlen=recent_window)
+        self.cusum = 0.0
+        self.shifted = False
+        self.regressed = False
+
+    def reference(self, hour: int) -> LatencyBaseline:
+        """Baseline for the given hour of day, or the overall one until it has enough data."""
+        slot = self.hourly[hour]
+        return slot if slot.count >= self.min_hour_samples else self.overall
+
+    def recent_p95(self) -> Optional[float]:
+        """Nearest-rank p95 of the recent ring buffer."""
+        if len(self.recent) < 5:
+            return None
+        return nearest_rank(self.recent, 95)
+
+    def observe(
+        self, latency: Optional[float], timestamp: float, timeout: Optional[float] = None
+    ) -> List[Anomaly]:
+        """Feed one probe latency (``None`` for a timeout) and return any new anomalies.
+
+        A timeout counts as the probe's own wait time, or ``timeout_value``
+        when it is not known.
+        """
+        if latency is None:
+            value = self.timeout_value if timeout is None else timeout
+        else:
+            value = latency
+        log_value = math.log(max(value, MIN_LATENCY))
+        hour = datetime.fromtimestamp(timestamp).hour
+        reference = self.reference(hour)
+        self.recent.append(value)
+
+        anomalies = []
+        if self.overall.count >= self.warmup:
+            anomalies.extend(self._check_change_point(log_value, reference))
+            anomalies.extend(self._check_p95(reference))
+
+        self.overall.update(log_value)
+        slot = self.hourly[hour]
+        if slot.count == 0 and self.overall.count > self.overall.exact_samples:
+            # A new hour of day starts from the settled overall baseline;
+            # early on every slot learns exactly from its own samples
+            slot.seed(self.overall)
+        slot.update(log_value)
+        return anomalies
+
+    def _check_change_point(self, log_value: float, reference: LatencyBaseline) -> List[Anomaly]:
+        # Clipping keeps one timeout from tripping the detector on its own
+        z = min((log_value - reference.mean) / reference.std, MAX_Z)
+        # Capped so a long shift can drain back to zero once the baseline adapts
+        self.cusum = min(max(0.0, self.cusum + z - self.cusum_slack), 2 * self.cusum_threshold)
+        if self.shifted:
+            if self.cusum == 0.0:
+                self.shifted = False
+            return []
+        if self.cusum <= self.cusum_threshold:
+            return []
+
+        self.shifted = True
+        baseline_p95 = math.exp(reference.p95)
+        recent_p95 = self.recent_p95() or math.exp(log_value)
+        return [Anomaly(
+            bot=self.bot,
+            kind="change_point",
+            description=(
+                f"Latency shifted upwards: typical {math.exp(reference.mean):.2f}s, "
+                f"recent p95 {recent_p95:.2f}s"
+            ),
+            recent_p95=recent_p95,
+            baseline_p95=baseline_p95,
+        )]
+
+    def _check_p95(self, reference: LatencyBaseline) -> List[Anomaly]:
+        recent_p95 = self.recent_p95()
+        if recent_p95 is None:
+            return []
+
+        baseline_p95 = math.exp(reference.p95)
+        limit = max(baseline_p95 * self.p95_ratio, baseline_p95 + self.min_delta)
+        if self.regressed:
+            # Hysteresis: stay regressed until the recent p95 is back under the limit
+            regressed = recent_p95 > limit
+        else:
+            # The p95 of a few dozen samples swings widely, so also require
+            # more samples above the baseline p95 than a stable bot, which
+            # exceeds it 5% of the time, would produce by chance
+            exceedances = sum(value > baseline_p95 for value in self.recent)
+            regressed = recent_p95 > limit and exceedances >= self.min_exceedances
+        if regressed == self.regressed:
+            return []
+
+        self.regressed = regressed
+        if not regressed:
+            logger.info(
+                f"📉 [{self.bot}] p95 back to baseline: recent {recent_p95:.2f}s, "
+                f"baseline {baseline_p95:.2f}s"
+            )
+            return []
+        return [Anomaly(
+            bot=self.bot,
+            kind="p95_regression",
+            description=(
+                f"p95 regressed: recent {recent_p95:.2f}s vs baseline "
+                f"{baseline_p95:.2f}s (x{recent_p95 / baseline_p95:.1f})"
+            ),
+            recent_p95=recent_p95,
+            baseline_p95=baseline_p95,
+        )]
+
+
+class AnomalyDetectors:
+    """Per-bot registry of latency anomaly detectors."""
+
+    def __init__(self, **detector_options):
+        self.detector_options = detector_options
+        self.detectors: Dict[str, LatencyAnomalyDetector] = {}
+
+    def get(self, bot: str) -> LatencyAnomalyDetector:
+        """Return the detector for ``bot``, creating it on first use."""
+        if bot not in self.detectors:
+            self.detectors[bot] = LatencyAnomalyDetector(bot, **self.detector_options)
+        return self.detectors[bot]
+
+    def observe(self, result: ProbeResult) -> List[Anomaly]:
+        """Feed a probe result to its bot's detector."""
+        return self.get(result.bot).observe(result.latency, result.timestamp, result.timeout)
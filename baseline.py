@@ -0,0 +1,193 @@
+"""
+Network baseline sampling for Telegram Bot Response Monitor.
+
+Measures MTProto ping round-trip time and ``send_message`` acknowledgement
+time on the monitor's own connection, so that slow bot replies can be
+told apart from a slow network or Telegram data centre.
+"""
+
+import asyncio
+import logging
+import random
+import statistics
+import string
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+from pyrogram import Client
+from pyrogram.errors import FloodWait, RPCError
+from pyrogram.raw.functions import Ping
+
+logger = logging.getLogger("BotMonitor")
+
+# Minimum number of samples before the rolling median is trusted
+MIN_SAMPLES_FOR_MEDIAN = 5
+
+
+@dataclass
+class BaselineSnapshot:
+    """Most recent baseline measurements and their rolling medians."""
+
+    rtt: Optional[float] = None
+    ack: Optional[float] = None
+    rtt_median: Optional[float] = None
+    ack_median: Optional[float] = None
+    degraded: bool = False
+
+
+class BaselineSampler:
+    """Background task sampling network latency on a shared client."""
+
+    def __init__(
+        self,
+        client: Optional[Client],
+        label: str,
+        interval: float = 30.0,
+        ack_probes: bool = True,
+        slow_seconds: float = 1.0,
+        slow_factor: float = 3.0,
+        window: int = 20,
+    ):
+        self.client = client
+        self.label = label
+        self.interval = interval
+        self.ack_probes = ack_probes
+        self.slow_seconds = slow_seconds
+        self.slow_factor = slow_factor
+        self.rtt_samples: Deque[float] = deque(maxlen=window)
+        self.ack_samples: Deque[float] = deque(maxlen=window)
+        self._snapshot = BaselineSnapshot()
+        self._task: Optional[asyncio.Task] = None
+        self._ack_paused_until = 0.0
+
+    def attach(self, client: Client):
+        """Sample on ``client`` from now on, keeping the rolling windows."""
+        self.client = client
+
+    def start(self):
+        """Start sampling in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🌐 [{self.label}] Baseline sampler started (every {self.interval:.0f}s)")
+
+    async def stop(self):
+        """Stop the background task and wait for it to exit."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Never let a sampler failure break the caller's shutdown
+            logger.error(f"❌ [{self.label}] Baseline sampler failed: {e}")
+        self._task = None
+
+    def snapshot(self) -> BaselineSnapshot:
+        """Return the latest baseline measurements."""
+        return self._snapshot
+
+    async def _run(self):
+        # Sample right away so the first probes of a batch get a baseline
+        while True:
+            try:
+                await self.sample_once()
+            except Exception as e:
+                # Connection errors surface as OSError/ConnectionError, not RPCError
+                logger.warning(f"⚠️ [{self.label}] Baseline sample failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sample_once(self):
+        """Take one ping sample and, if enabled, one ack sample."""
+        rtt = await self._sample_ping()
+        ack = None
+        if self.ack_probes and time.monotonic() >= self._ack_paused_until:
+            ack = await self._sample_ack()
+        self._update(rtt, ack)
+
+    async def _sample_ping(self) -> Optional[float]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self.client.invoke(Ping(ping_id=random.getrandbits(63))),
+                timeout=self.interval,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"🌐 [{self.label}] MTProto ping timed out after {self.interval:.0f}s")
+            return self.interval
+        except RPCError as e:
+            logger.warning(f"⚠️ [{self.label}] MTProto ping failed: {e}")
+            return None
+        return time.perf_counter() - started
+
+    async def _sample_ack(self) -> Optional[float]:
+        text = "baseline " + "".join(random.choices(string.ascii_letters, k=8))
+        started = time.perf_counter()
+        try:
+            sent = await asyncio.wait_for(
+                self.client.send_message("me", text),
+                timeout=self.interval,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"🌐 [{self.label}] Saved Messages ack timed out after {self.interval:.0f}s")
+            return self.interval
+        except FloodWait as e:
+            logger.warning(f"🚦 [{self.label}] Baseline ack probes paused for {e.value} seconds")
+            self._ack_paused_until = time.monotonic() + e.value
+            return None
+        except RPCError as e:
+            logger.warning(f"⚠️ [{self.label}] Saved Messages ack failed: {e}")
+            return None
+        ack = time.perf_counter() - started
+
+        try:
+            await self.client.delete_messages("me", sent.id)
+        except RPCError as e:
+            logger.warning(f"⚠️ [{self.label}] Could not delete baseline message: {e}")
+        return ack
+
+    def _update(self, rtt: Optional[float], ack: Optional[float]):
+        if rtt is not None:
+            self.rtt_samples.append(rtt)
+        if ack is not None:
+            self.ack_samples.append(ack)
+
+        rtt_median = self._median(self.rtt_samples)
+        ack_median = self._median(self.ack_samples)
+        degraded = self._is_slow(rtt, rtt_median) or self._is_slow(ack, ack_median)
+
+        if degraded and not self._snapshot.degraded:
+            logger.warning(
+                f"🌐 [{self.label}] Network baseline degraded "
+                f"(rtt: {self._fmt(rtt)}, ack: {self._fmt(ack)})"
+            )
+        elif self._snapshot.degraded and not degraded:
+            logger.info(f"🌐 [{self.label}] Network baseline recovered")
+
+        self._snapshot = BaselineSnapshot(
+            rtt=rtt if rtt is not None else self._snapshot.rtt,
+            ack=ack if ack is not None else self._snapshot.ack,
+            rtt_median=rtt_median,
+            ack_median=ack_median,
+            degraded=degraded,
+        )
+
+    def _is_slow(self, value: Optional[float], median: Optional[float]) -> bool:
+        if value is None:
+            return False
+        if value > self.slow_seconds:
+            return True
+        return median is not None and value > median * self.slow_factor
+
+    @staticmethod
+    def _median(samples: Deque[float]) -> Optional[float]:
+        if len(samples) < MIN_SAMPLES_FOR_MEDIAN:
+            return None
+        return statistics.median(samples)
+
+    @staticmethod
+    def _fmt(value: Optional[float]) -> str:
+        return "n/a" if value is None else f"{value * 1000:.0f}ms"
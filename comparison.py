@@ -0,0 +1,107 @@
+"""
+Paired A/B comparison of two bot deployments for Telegram Bot Response Monitor.
+
+Probes to a baseline bot and a candidate bot are sent as time-aligned pairs,
+so per-pair differences cancel out network and data centre noise. This
+module accumulates those differences in constant memory and reports the
+mean latency difference and the latency ratio with 95% confidence intervals.
+"""
+
+import math
+from typing import Optional, Tuple
+
+from metrics import ProbeResult
+
+# Two-sided 95% Student t critical values for 1..30 degrees of freedom
+T_CRITICAL_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+Z_95 = 1.96
+# Latencies are clamped before taking logs; reply dates have 1s resolution
+MIN_LATENCY = 0.05
+
+
+def t_critical(df: int) -> float:
+    """Two-sided 95% critical value of Student's t distribution."""
+    if df <= len(T_CRITICAL_95):
+        return T_CRITICAL_95[df - 1]
+    # Cornish-Fisher expansion, accurate to ~0.01 above 30 degrees of freedom
+    return Z_95 + (Z_95 ** 3 + Z_95) / (4 * df)
+
+
+class RunningStats:
+    """Welford running mean and variance."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    def confidence_interval(self) -> Optional[Tuple[float, float]]:
+        """95% confidence interval of the mean, or None with fewer than two samples."""
+        if self.n < 2:
+            return None
+        half_width = t_critical(self.n - 1) * math.sqrt(self._m2 / (self.n - 1) / self.n)
+        return self.mean - half_width, self.mean + half_width
+
+
+class PairedComparison:
+    """Accumulates time-paired probe results from a baseline and a candidate bot."""
+
+    def __init__(self, baseline_bot: str, candidate_bot: str):
+        self.baseline_bot = baseline_bot
+        self.candidate_bot = candidate_bot
+        self.differences = RunningStats()
+        self.log_ratios = RunningStats()
+        self.pairs = 0
+        self.baseline_timeouts = 0
+        self.candidate_timeouts = 0
+
+    def add(self, baseline: ProbeResult, candidate: ProbeResult):
+        """Add one pair of probe results."""
+        self.pairs += 1
+        self.baseline_timeouts += int(baseline.timed_out)
+        self.candidate_timeouts += int(candidate.timed_out)
+        if baseline.timed_out or candidate.timed_out:
+            return
+        self.differences.add(candidate.latency - baseline.latency)
+        self.log_ratios.add(
+            math.log(max(candidate.latency, MIN_LATENCY)) - math.log(max(baseline.latency, MIN_LATENCY))
+        )
+
+    def verdict(self) -> str:
+        """Whether the candidate is significantly slower, faster or indistinguishable."""
+        interval = self.differences.confidence_interval()
+        if interval is None:
+            return "insufficient data"
+        low, high = interval
+        if low > 0:
+            return "candidate slower"
+        if high < 0:
+            return "candidate faster"
+        return "no significant difference"
+
+    def summary(self) -> str:
+        """One-line report of the latency difference and its confidence interval."""
+        header = f"{self.candidate_bot} vs {self.baseline_bot}"
+        timeouts = f"timeouts: candidate {self.candidate_timeouts}, baseline {self.baseline_timeouts}"
+        interval = self.differences.confidence_interval()
+        if interval is None:
+            return f"{header}: {self.differences.n} complete pairs of {self.pairs}, {timeouts}"
+
+        low, high = interval
+        ratio_low, ratio_high = self.log_ratios.confidence_interval()
+        return (
+            f"{header}: mean Δ {self.differences.mean:+.2f}s (95% CI {low:+.2f}s..{high:+.2f}s), "
+            f"ratio x{math.exp(self.log_ratios.mean):.2f} "
+            f"(95% CI x{math.exp(ratio_low):.2f}..x{math.exp(ratio_high):.2f}), "
+            f"{self.differences.n} complete pairs of {self.pairs}, {timeouts} - {self.verdict()}"
+        )
@@ -0,0 +1,228 @@
+"""
+Live terminal dashboard for Telegram Bot Response Monitor.
+
+Probe results update small per-bot structures in memory: a ring of
+per-minute histograms for rolling percentiles and a ring of recent
+latencies for the sparkline. The renderer redraws at a fixed frame rate.
+It only recomputes rows of bots that changed since the last frame and only
+rewrites terminal lines whose text changed, so the cost of a frame does
+not grow with history and stays small with hundreds of bots.
+"""
+
+import asyncio
+import shutil
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from histogram import LatencyHistogram
+from metrics import ProbeResult
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+TIMEOUT_CHAR = "✗"
+SPARK_WIDTH = 30
+
+CLEAR_SCREEN = "\x1b[2J"
+CURSOR_HOME = "\x1b[H"
+CLEAR_LINE = "\x1b[K"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+
+
+class BotMetrics:
+    """Rolling in-memory metrics for one bot."""
+
+    def __init__(self, window_minutes: int):
+        self.minutes: Deque[Tuple[int, LatencyHistogram]] = deque(maxlen=window_minutes)
+        self.recent: Deque[Optional[float]] = deque(maxlen=SPARK_WIDTH)
+        self.in_flight = 0
+        self.flood_wait_until = 0.0
+        self.last: Optional[ProbeResult] = None
+        self.dirty = True
+        self.row: Tuple = ()
+
+    def add(self, result: ProbeResult):
+        minute = int(result.timestamp // 60)
+        if not self.minutes or self.minutes[-1][0] != minute:
+            self.minutes.append((minute, LatencyHistogram()))
+        self.minutes[-1][1].add(result.latency)
+        self.recent.append(result.latency)
+        self.last = result
+        self.dirty = True
+
+    def window(self, now_minute: int) -> LatencyHistogram:
+        """Merge the per-minute histograms still inside the rolling window."""
+        merged = LatencyHistogram()
+        for minute, histogram in self.minutes:
+            if minute > now_minute - self.minutes.maxlen:
+                merged.merge(histogram)
+        return merged
+
+
+class LiveMetrics:
+    """In-memory metrics shared between the probe loop and the dashboard."""
+
+    def __init__(self, window_minutes: int = 5):
+        self.window_minutes = window_minutes
+        self.bots: Dict[str, BotMetrics] = {}
+        self.total_probes = 0
+
+    def bot(self, bot: str) -> BotMetrics:
+        if bot not in self.bots:
+            self.bots[bot] = BotMetrics(self.window_minutes)
+        return self.bots[bot]
+
+    def probe_started(self, bot: str):
+        metrics = self.bot(bot)
+        metrics.in_flight += 1
+        metrics.dirty = True
+
+    def probe_finished(self, bot: str):
+        metrics = self.bot(bot)
+        metrics.in_flight = max(0, metrics.in_flight - 1)
+        metrics.dirty = True
+
+    def record(self, result: ProbeResult):
+        self.bot(result.bot).add(result)
+        self.total_probes += 1
+
+    def flood_wait(self, bot: str, seconds: float):
+        metrics = self.bot(bot)
+        metrics.flood_wait_until = time.time() + seconds
+        metrics.dirty = True
+
+
+def sparkline(values: Deque[Optional[float]]) -> str:
+    """Render latencies as a sparkline scaled to their own maximum."""
+    answered = [value for value in values if value is not None]
+    top = max(answered, default=0.0) or 1.0
+    chars = []
+    for value in values:
+        if value is None:
+            chars.append(TIMEOUT_CHAR)
+        else:
+            chars.append(SPARK_CHARS[min(len(SPARK_CHARS) - 1, int(value / top * (len(SPARK_CHARS) - 1)))])
+    return "".join(chars)
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+class Dashboard:
+    """Fixed-frame-rate ANSI renderer for :class:`LiveMetrics`."""
+
+    def __init__(
+        self,
+        metrics: LiveMetrics,
+        loop_lag: Callable[[], float],
+        fps: float = 4.0,
+        threshold: float = 5.0,
+        stream=sys.stdout,
+    ):
+        self.metrics = metrics
+        self.loop_lag = loop_lag
+        self.fps = fps
+        self.threshold = threshold
+        self.stream = stream
+        self._previous: List[str] = []
+        self._last_minute = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self.stream.write(HIDE_CURSOR + CLEAR_SCREEN)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.stream.write(SHOW_CURSOR + "\n")
+        self.stream.flush()
+
+    async def _run(self):
+        interval = 1.0 / self.fps
+        while True:
+            started = time.perf_counter()
+            self.draw()
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+    def _refresh_row(self, bot: str, metrics: BotMetrics, now_minute: int):
+        window = metrics.window(now_minute)
+        last = metrics.last
+        if last is None:
+            status = "…"
+        elif last.timed_out:
+            status = "🔴"
+        elif last.slow:
+            status = "🟡"
+        else:
+            status = "🟢"
+        metrics.row = (
+            window.percentile(95) or 0.0,
+            f"{status} {bot:<24.24} {metrics.in_flight:>3} {window.count + window.timeouts:>6} "
+            f"{window.timeouts:>5} {format_seconds(window.percentile(50)):>6} "
+            f"{format_seconds(window.percentile(95)):>6} {format_seconds(window.percentile(99)):>6} "
+            f"{format_seconds(last.latency if last else None):>6}  {sparkline(metrics.recent):<{SPARK_WIDTH}}",
+        )
+        metrics.dirty = False
+
+    def frame(self) -> List[str]:
+        """Build the lines of the next frame, refreshing only changed bots."""
+        now = time.time()
+        now_minute = int(now // 60)
+        # Rows depend on the rolling window, so refresh all of them once a minute
+        refresh_all = now_minute != self._last_minute
+        self._last_minute = now_minute
+
+        rows = []
+        for bot, metrics in self.metrics.bots.items():
+            flood_wait = max(0.0, metrics.flood_wait_until - now)
+            if metrics.dirty or refresh_all or not metrics.row:
+                self._refresh_row(bot, metrics, now_minute)
+            line = metrics.row[1]
+            if flood_wait > 0:
+                line += f" 🚦 {flood_wait:.0f}s"
+            rows.append((metrics.row[0], line))
+        rows.sort(key=lambda row: row[0], reverse=True)
+
+        lag = self.loop_lag()
+        width, height = shutil.get_terminal_size()
+        header = [
+            f"📊 Bot Response Monitor  {datetime.now().strftime('%H:%M:%S')}  "
+            f"bots: {len(rows)}  probes: {self.metrics.total_probes}  "
+            f"loop lag: {lag * 1000:.0f}ms  window: {self.metrics.window_minutes}m  slow > {self.threshold:g}s",
+            "",
+            f"   {'bot':<24} {'fly':>3} {'probes':>6} {'miss':>5} {'p50':>6} {'p95':>6} {'p99':>6} {'last':>6}  recent",
+        ]
+        visible = max(0, height - len(header) - 1)
+        lines = header + [line for _, line in rows[:visible]]
+        if len(rows) > visible:
+            lines.append(f"… {len(rows) - visible} more bots")
+        return [line[:width] for line in lines]
+
+    def draw(self):
+        """Write the lines that changed since the previous frame."""
+        lines = self.frame()
+        output = []
+        for index, line in enumerate(lines):
+            if index >= len(self._previous) or self._previous[index] != line:
+                output.append(f"\x1b[{index + 1};1H{line}{CLEAR_LINE}")
+        for index in range(len(lines), len(self._previous)):
+            output.append(f"\x1b[{index + 1};1H{CLEAR_LINE}")
+        self._previous = lines
+        if output:
+            self.stream.write("".join(output) + CURSOR_HOME)
+            self.stream.flush()
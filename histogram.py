@@ -0,0 +1,138 @@
+"""
+Mergeable latency histogram for Telegram Bot Response Monitor.
+
+Latencies are counted in logarithmic buckets with a fixed relative error,
+so histograms from different files, processes or machines can be merged by
+adding bucket counts and still answer percentile queries accurately.
+"""
+
+import math
+from typing import Any, Dict, Iterable, Optional
+
+# Relative width of each bucket; percentiles are accurate to about 1%
+BUCKET_GROWTH = 1.02
+# Latencies at or below this value share bucket 0
+MIN_TRACKED_LATENCY = 0.001
+
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram of latencies plus a timeout counter."""
+
+    __slots__ = ("buckets", "count", "timeouts", "total", "minimum", "maximum")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+
+    @staticmethod
+    def bucket_index(latency: float) -> int:
+        """Bucket holding ``latency``."""
+        if latency <= MIN_TRACKED_LATENCY:
+            return 0
+        return 1 + int(math.log(latency / MIN_TRACKED_LATENCY) / _LOG_GROWTH)
+
+    @staticmethod
+    def bucket_value(index: int) -> float:
+        """Representative latency of a bucket (its geometric midpoint)."""
+        if index == 0:
+            return 0.0
+        return MIN_TRACKED_LATENCY * BUCKET_GROWTH ** (index - 0.5)
+
+    def add(self, latency: Optional[float], count: int = 1):
+        """Record a latency, or a timeout when ``latency`` is None."""
+        if latency is None:
+            self.timeouts += count
+            return
+        index = self.bucket_index(latency)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += latency * count
+        self.minimum = latency if self.minimum is None else min(self.minimum, latency)
+        self.maximum = latency if self.maximum is None else max(self.maximum, latency)
+
+    def add_all(self, latencies: Iterable[Optional[float]]):
+        """Record every latency in ``latencies``."""
+        for latency in latencies:
+            self.add(latency)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one and return self."""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.timeouts += other.timeouts
+        self.total += other.total
+        if other.minimum is not None:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        if other.maximum is not None:
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        return self
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency at percentile ``q`` (0-100) of answered probes."""
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                value = self.bucket_value(index)
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable form, see :meth:`from_dict`."""
+        return {
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "count": self.count,
+            "timeouts": self.timeouts,
+            "total": self.total,
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        """Rebuild a histogram produced by :meth:`to_dict`.
+
+        Raises ValueError when a field has the wrong type or the counts do
+        not add up, so data from another process cannot break later queries.
+        """
+        histogram = cls()
+        histogram.buckets = {int(index): _count(count) for index, count in data["buckets"].items()}
+        histogram.count = _count(data["count"])
+        histogram.timeouts = _count(data["timeouts"])
+        histogram.total = _latency(data["total"])
+        histogram.minimum = _latency(data["min"], optional=True)
+        histogram.maximum = _latency(data["max"], optional=True)
+        if sum(histogram.buckets.values()) != histogram.count:
+            raise ValueError("bucket counts do not add up to count")
+        if histogram.count and (histogram.minimum is None or histogram.maximum is None):
+            raise ValueError("min and max are required when count is positive")
+        return histogram
+
+
+def _count(value: Any) -> int:
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"expected a non-negative integer count, got {value!r}")
+    return value
+
+
+def _latency(value: Any, optional: bool = False) -> Optional[float]:
+    if value is None and optional:
+        return None
+    if (not isinstance(value, (int, float)) or isinstance(value, bool)
+            or not math.isfinite(value) or value < 0):
+        raise ValueError(f"expected a non-negative latency, got {value!r}")
+    return float(value)
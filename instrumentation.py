@@ -0,0 +1,191 @@
+"""
+Self-instrumentation for Telegram Bot Response Monitor.
+
+Every latency the monitor reports is measured from inside a single asyncio
+event loop. These helpers make it possible to prove that loop was not
+starved while measuring: an event-loop lag monitor, per-stage timers, an
+optional uvloop backend and a signal-triggered sampling profiler.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger("BotMonitor")
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up from a fixed-interval sleep."""
+
+    def __init__(self, interval: float = 0.5, warn_seconds: float = 0.1, window: int = 1200):
+        self.interval = interval
+        self.warn_seconds = warn_seconds
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=window)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the lag monitor on the running loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the lag monitor."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.samples.append((time.monotonic(), lag))
+            if lag > self.warn_seconds:
+                logger.warning(f"🐢 Event loop lagged {lag * 1000:.0f}ms - measurements may be inflated")
+
+    def reset_max(self):
+        """Forget the largest lag seen so far."""
+        self.max_lag = 0.0
+
+    def max_since(self, since: float) -> float:
+        """Largest lag observed since a ``time.monotonic()`` timestamp."""
+        return max((lag for ts, lag in self.samples if ts >= since), default=0.0)
+
+
+class StageTimers:
+    """Accumulate wall-clock time spent in each stage of a probe."""
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.maxima: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block under ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed
+            self.counts[name] = self.counts.get(name, 0) + 1
+            self.maxima[name] = max(self.maxima.get(name, 0.0), elapsed)
+
+    def reset(self):
+        """Clear all accumulated timings."""
+        self.totals.clear()
+        self.counts.clear()
+        self.maxima.clear()
+
+    def summary(self) -> str:
+        """One-line summary of mean and max time per stage."""
+        parts = []
+        for name, total in self.totals.items():
+            mean = total / self.counts[name]
+            parts.append(f"{name} avg {mean * 1000:.1f}ms / max {self.maxima[name] * 1000:.1f}ms")
+        return ", ".join(parts) if parts else "no samples"
+
+
+def install_uvloop() -> bool:
+    """Use uvloop as the asyncio event loop if it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("⚠️ USE_UVLOOP is enabled but uvloop is not installed - using default event loop")
+        logger.info("💡 Run: pip install uvloop")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("⚙️ Using uvloop event loop")
+    return True
+
+
+class SamplingProfiler:
+    """Sample the main thread's stack on demand and dump collapsed stacks.
+
+    Sampling from a separate thread keeps the overhead on the event loop
+    small, unlike a deterministic profiler. The output uses the collapsed
+    stack format understood by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, output_dir: str = "profiles", duration: float = 30.0, rate_hz: float = 100.0):
+        self.output_dir = output_dir
+        self.duration = duration
+        self.rate_hz = rate_hz
+        self._thread: Optional[threading.Thread] = None
+        self._target_thread_id = threading.main_thread().ident
+
+    def install(self, signum: Optional[int] = None) -> bool:
+        """Register a signal handler (SIGUSR1 by default) that starts a profile."""
+        if signum is None:
+            signum = getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            logger.warning("⚠️ Signal-triggered profiling is not supported on this platform")
+            return False
+        signal.signal(signum, self._handle_signal)
+        logger.info(f"🔬 Sampling profiler armed - send signal {int(signum)} (kill -USR1 {os.getpid()}) to profile")
+        return True
+
+    def _handle_signal(self, signum, frame):
+        self.start()
+
+    def start(self) -> bool:
+        """Start a profile in the background unless one is already running."""
+        if self._thread is not None and self._thread.is_alive():
+            logger.info("🔬 Profile already in progress")
+            return False
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        logger.info(f"🔬 Profiling for {self.duration:.0f}s at {self.rate_hz:.0f}Hz...")
+        stacks: Counter = Counter()
+        interval = 1.0 / self.rate_hz
+        deadline = time.monotonic() + self.duration
+        samples = 0
+
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._target_thread_id)
+            if frame is not None:
+                stacks[self._collapse(frame)] += 1
+                samples += 1
+            time.sleep(interval)
+
+        path = self._write(stacks)
+        logger.info(f"🔬 Profile written to {path} ({samples} samples)")
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _write(self, stacks: Counter) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        filename = datetime.now().strftime("profile_%Y%m%d_%H%M%S.folded")
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
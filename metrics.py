@@ -0,0 +1,47 @@
+"""
+Shared metric records for Telegram Bot Response Monitor.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of a single probe message sent to a bot."""
+
+    bot: str
+    message: str
+    timestamp: float = field(default_factory=time.time)
+    latency: Optional[float] = None
+    client_latency: Optional[float] = None
+    threshold: float = 0.0
+    timeout: float = 10.0
+    baseline_rtt: Optional[float] = None
+    baseline_ack: Optional[float] = None
+    infra_degraded: bool = False
+    loop_lag: float = 0.0
+
+    @property
+    def timed_out(self) -> bool:
+        """True when the bot did not reply within the wait window."""
+        return self.latency is None
+
+    @property
+    def slow(self) -> bool:
+        """True when the reply arrived but exceeded the slow threshold."""
+        return self.latency is not None and self.latency > self.threshold
+
+    @property
+    def adjusted_latency(self) -> Optional[float]:
+        """Client-side latency with the network round-trip baseline subtracted.
+
+        ``latency`` is a difference of server-assigned whole-second dates, so a
+        sub-second rtt can only be taken off the client's own monotonic timing.
+        """
+        if self.client_latency is None:
+            return None
+        if self.baseline_rtt is None:
+            return self.client_latency
+        return max(0.0, self.client_latency - self.baseline_rtt)
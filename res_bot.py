@@ -6,8 +6,11 @@ import time
 import os
 import sys
 import signal
+import socket
+import sqlite3
+import statistics
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from dotenv import load_dotenv
 from pyrogram import Client
 from pyrogram.errors import (
@@ -18,6 +21,16 @@ from pyrogram.errors import (
     SessionPasswordNeeded,
     PhoneNumberInvalid
 )
+from adaptive import AdaptiveBatchController
+from aggregator import DEFAULT_PORT, AgentShipper
+from alerts import AlertDispatcher, AlertSink, FileSink, TelegramSink, WebhookSink
+from anomaly import AnomalyDetectors
+from baseline import BaselineSampler
+from comparison import PairedComparison
+from dashboard import Dashboard, LiveMetrics
+from instrumentation import LoopLagMonitor, SamplingProfiler, StageTimers, install_uvloop
+from metrics import ProbeResult
+from rollup_store import RollupStore
 
 # Load environment variables
 load_dotenv()
@@ -29,11 +42,57 @@ def load_config() -> Dict[str, Any]:
         "api_id": os.getenv("API_ID"),
         "api_hash": os.getenv("API_HASH"),
         "target_bot_username": os.getenv("TARGET_BOT_USERNAME", "@hwjz"),
+        "candidate_bot_username": os.getenv("CANDIDATE_BOT_USERNAME", ""),
         "loop": os.getenv("LOOP", "true").lower() == "true",
         "duration_minutes": int(os.getenv("DURATION_MINUTES", "1")),
         "message_count": int(os.getenv("MESSAGE_COUNT", "20")),
         "max_runtime_hours": int(os.getenv("MAX_RUNTIME_HOURS", "24")),
         "response_threshold_seconds": float(os.getenv("RESPONSE_THRESHOLD_SECONDS", "5")),
+        "baseline_sampling": os.getenv("BASELINE_SAMPLING", "true").lower() == "true",
+        "baseline_interval_seconds": float(os.getenv("BASELINE_INTERVAL_SECONDS", "30")),
+        "baseline_ack_probes": os.getenv("BASELINE_ACK_PROBES", "true").lower() == "true",
+        "baseline_slow_seconds": float(os.getenv("BASELINE_SLOW_SECONDS", "1")),
+        "loop_lag_interval_seconds": float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5")),
+        "loop_lag_warn_seconds": float(os.getenv("LOOP_LAG_WARN_SECONDS", "0.1")),
+        "use_uvloop": os.getenv("USE_UVLOOP", "false").lower() == "true",
+        "profile_seconds": float(os.getenv("PROFILE_SECONDS", "30")),
+        "profile_dir": os.getenv("PROFILE_DIR", "profiles"),
+        "anomaly_detection": os.getenv("ANOMALY_DETECTION", "true").lower() == "true",
+        "anomaly_p95_ratio": float(os.getenv("ANOMALY_P95_RATIO", "1.5")),
+        "anomaly_min_delta_seconds": float(os.getenv("ANOMALY_MIN_DELTA_SECONDS", "1.0")),
+        "anomaly_warmup_samples": int(os.getenv("ANOMALY_WARMUP_SAMPLES", "50")),
+        "max_wait_seconds": float(os.getenv("MAX_WAIT_SECONDS", "10")),
+        "adaptive_batches": os.getenv("ADAPTIVE_BATCHES", "true").lower() == "true",
+        "adaptive_timeouts": os.getenv("ADAPTIVE_TIMEOUTS", "true").lower() == "true",
+        "min_probes_per_batch": int(os.getenv("MIN_PROBES_PER_BATCH", "5")),
+        "slo_healthy_bad_rate": float(os.getenv("SLO_HEALTHY_BAD_RATE", "0.05")),
+        "slo_degraded_bad_rate": float(os.getenv("SLO_DEGRADED_BAD_RATE", "0.5")),
+        "rollup_store": os.getenv("ROLLUP_STORE", "true").lower() == "true",
+        "rollup_db_path": os.getenv("ROLLUP_DB_PATH", "bot_latency.db"),
+        "retention_days": {
+            "raw": float(os.getenv("RAW_RETENTION_DAYS", "7")),
+            "minute": float(os.getenv("MINUTE_ROLLUP_RETENTION_DAYS", "2")),
+            "hour": float(os.getenv("HOUR_ROLLUP_RETENTION_DAYS", "90")),
+            "day": float(os.getenv("DAY_ROLLUP_RETENTION_DAYS", "730")),
+        },
+        "agent_mode": os.getenv("AGENT_MODE", "false").lower() == "true",
+        "aggregator_host": os.getenv("AGGREGATOR_HOST", "127.0.0.1"),
+        "aggregator_port": int(os.getenv("AGGREGATOR_PORT", str(DEFAULT_PORT))),
+        "aggregator_token": os.getenv("AGGREGATOR_TOKEN", ""),
+        "vantage_name": os.getenv("VANTAGE_NAME") or socket.gethostname(),
+        "agent_flush_seconds": float(os.getenv("AGENT_FLUSH_SECONDS", "10")),
+        "agent_max_samples": int(os.getenv("AGENT_MAX_SAMPLES", "1000")),
+        "alert_file": os.getenv("ALERT_FILE", "alerts.jsonl"),
+        "alert_webhook_url": os.getenv("ALERT_WEBHOOK_URL", ""),
+        "alert_telegram_bot_token": os.getenv("ALERT_TELEGRAM_BOT_TOKEN", ""),
+        "alert_telegram_chat_id": os.getenv("ALERT_TELEGRAM_CHAT_ID", ""),
+        "alert_window_seconds": float(os.getenv("ALERT_WINDOW_SECONDS", "60")),
+        "alert_confirm_windows": int(os.getenv("ALERT_CONFIRM_WINDOWS", "2")),
+        "alert_flap_threshold": int(os.getenv("ALERT_FLAP_THRESHOLD", "4")),
+        "alert_flap_window_minutes": float(os.getenv("ALERT_FLAP_WINDOW_MINUTES", "60")),
+        "dashboard": os.getenv("DASHBOARD", "false").lower() == "true",
+        "dashboard_fps": float(os.getenv("DASHBOARD_FPS", "4")),
+        "dashboard_window_minutes": int(os.getenv("DASHBOARD_WINDOW_MINUTES", "5")),
         "stop_flag_file": "stop.flag",
         "session_dir": "sessions"  # Directory for session files
     }
@@ -51,9 +110,17 @@ def load_config() -> Dict[str, Any]:
     except ValueError:
         raise ValueError("API_ID must be a valid integer.")
     
+    if not 0 < config["slo_healthy_bad_rate"] < config["slo_degraded_bad_rate"] < 1:
+        raise ValueError("SLO rates must satisfy 0 < SLO_HEALTHY_BAD_RATE < SLO_DEGRADED_BAD_RATE < 1.")
+    if config["min_probes_per_batch"] < 1:
+        raise ValueError("MIN_PROBES_PER_BATCH must be at least 1.")
+    
     if not config["target_bot_username"].startswith("@"):
         config["target_bot_username"] = f"@{config['target_bot_username']}"
     
+    if config["candidate_bot_username"] and not config["candidate_bot_username"].startswith("@"):
+        config["candidate_bot_username"] = f"@{config['candidate_bot_username']}"
+    
     # Create session directory if it doesn't exist
     os.makedirs(config["session_dir"], exist_ok=True)
     
@@ -70,6 +137,8 @@ def setup_logging() -> logging.Logger:
     
     # Clear existing handlers to avoid duplicates
     logger.handlers.clear()
+    # The file handler may also be attached to the root logger, see set_console_logging
+    logger.propagate = False
 
     # File handler
     file_handler = logging.FileHandler("bot_response_times.log")
@@ -89,6 +158,51 @@ logger = setup_logging()
 
 # ----- GLOBAL STATE -----
 shutdown_event = asyncio.Event()
+stage_timers = StageTimers()
+lag_monitor = LoopLagMonitor(
+    interval=CONFIG["loop_lag_interval_seconds"],
+    warn_seconds=CONFIG["loop_lag_warn_seconds"]
+)
+batch_controller = AdaptiveBatchController(
+    base_probes=CONFIG["message_count"],
+    min_probes=CONFIG["min_probes_per_batch"],
+    healthy_bad_rate=CONFIG["slo_healthy_bad_rate"],
+    degraded_bad_rate=CONFIG["slo_degraded_bad_rate"],
+    max_wait=CONFIG["max_wait_seconds"],
+    # A slow reply must still be seen as slow rather than missed, so the
+    # timeout keeps a margin of one more threshold above it
+    min_wait=min(2 * CONFIG["response_threshold_seconds"], CONFIG["max_wait_seconds"]),
+    early_stop=CONFIG["adaptive_batches"],
+    adaptive_timeouts=CONFIG["adaptive_timeouts"]
+)
+comparison = (
+    PairedComparison(CONFIG["target_bot_username"], CONFIG["candidate_bot_username"])
+    if CONFIG["candidate_bot_username"] else None
+)
+anomaly_detectors = AnomalyDetectors(
+    timeout_value=CONFIG["max_wait_seconds"],
+    p95_ratio=CONFIG["anomaly_p95_ratio"],
+    min_delta=CONFIG["anomaly_min_delta_seconds"],
+    warmup=CONFIG["anomaly_warmup_samples"]
+)
+rollup_store: Optional[RollupStore] = None
+agent: Optional[AgentShipper] = None
+alert_dispatcher: Optional[AlertDispatcher] = None
+# Created once so its rolling medians survive across batches; each batch attaches its client
+baseline_sampler = (
+    BaselineSampler(
+        None,
+        CONFIG["target_bot_username"],
+        interval=CONFIG["baseline_interval_seconds"],
+        ack_probes=CONFIG["baseline_ack_probes"],
+        slow_seconds=CONFIG["baseline_slow_seconds"]
+    )
+    if CONFIG["baseline_sampling"] else None
+)
+live_metrics = LiveMetrics(CONFIG["dashboard_window_minutes"]) if CONFIG["dashboard"] else None
+dashboard: Optional[Dashboard] = None
+# Newest reply id seen from each bot, so a late reply is never matched to a later probe
+last_reply_ids: Dict[str, int] = {}
 
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully."""
@@ -136,18 +250,381 @@ def ensure_session_directory():
 def generate_random_message(length=8):
     return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
 
+def is_reply_to(message, sent_msg, username: str) -> bool:
+    """True when ``message`` is the bot's answer to ``sent_msg``.
+
+    Message ids only grow within a chat. A reply must be newer than the probe
+    and than any reply already seen, and must quote the probe if it quotes.
+    """
+    if message.outgoing or message.id <= max(sent_msg.id, last_reply_ids.get(username, 0)):
+        return False
+    return message.reply_to_message_id in (None, sent_msg.id)
+
+def format_baseline(result: ProbeResult) -> str:
+    """Format the network baseline recorded with a probe for log output."""
+    if result.baseline_rtt is None and result.baseline_ack is None:
+        return ""
+    rtt = f"{result.baseline_rtt * 1000:.0f}ms" if result.baseline_rtt is not None else "n/a"
+    ack = f"{result.baseline_ack:.2f}s" if result.baseline_ack is not None else "n/a"
+    flag = ", infra degraded" if result.infra_degraded else ""
+    return f" [baseline rtt: {rtt}, ack: {ack}{flag}]"
+
+def record_probe(result: ProbeResult):
+    """Log the outcome of a single probe and hand it to the enabled subsystems."""
+    username = result.bot
+    with stage_timers.stage("log"):
+        baseline = format_baseline(result)
+        if result.loop_lag > CONFIG["loop_lag_warn_seconds"]:
+            baseline += f" [loop lag: {result.loop_lag * 1000:.0f}ms]"
+        if result.timed_out:
+            logger.warning(f"❌ [{username}] No response within {result.timeout:.0f}s for message '{result.message}'{baseline}")
+        elif result.slow:
+            logger.warning(f"🐌 [{username}] Slow response ({result.latency:.2f}s) for message '{result.message}'{baseline}")
+        else:
+            logger.info(f"⚡ [{username}] Fast response time: {result.latency:.2f}s{baseline}")
+
+    if CONFIG["anomaly_detection"]:
+        with stage_timers.stage("anomaly"):
+            for anomaly in anomaly_detectors.observe(result):
+                logger.warning(f"📈 [{username}] Latency anomaly ({anomaly.kind}): {anomaly.description}")
+                if alert_dispatcher:
+                    alert_dispatcher.anomaly(anomaly)
+
+    if rollup_store:
+        with stage_timers.stage("store"):
+            try:
+                rollup_store.add(result)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ [{username}] Could not write probe to rollup store: {e}")
+
+    # Queue-only hand-offs: agent shipping, alerting and the dashboard
+    with stage_timers.stage("dispatch"):
+        if agent:
+            agent.submit(result)
+
+        if alert_dispatcher:
+            alert_dispatcher.observe(result)
+
+        if live_metrics:
+            live_metrics.record(result)
+
+def set_console_logging(enabled: bool):
+    """
+    Mute or unmute console logging, which would otherwise scribble over the dashboard.
+    
+    While muted, records from other loggers such as Pyrogram's go to the log
+    file; without a handler of their own they would reach stderr through
+    logging's last-resort handler.
+    """
+    root = logging.getLogger()
+    for handler in logger.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(logging.NOTSET if enabled else logging.CRITICAL + 1)
+        elif isinstance(handler, logging.FileHandler):
+            if enabled:
+                root.removeHandler(handler)
+            else:
+                root.addHandler(handler)
+
+def create_alert_sinks() -> List[AlertSink]:
+    """Build the alert sinks enabled in the configuration."""
+    sinks: List[AlertSink] = []
+    if CONFIG["alert_file"]:
+        sinks.append(FileSink(CONFIG["alert_file"]))
+    if CONFIG["alert_webhook_url"]:
+        sinks.append(WebhookSink(CONFIG["alert_webhook_url"]))
+    if CONFIG["alert_telegram_bot_token"] and CONFIG["alert_telegram_chat_id"]:
+        sinks.append(TelegramSink(CONFIG["alert_telegram_bot_token"], CONFIG["alert_telegram_chat_id"]))
+    return sinks
+
+# ----- PROBING -----
+async def send_probe(
+    client: Client,
+    username: str,
+    max_wait: float,
+    sampler: Optional[BaselineSampler] = None,
+    number: int = 1
+) -> Optional[ProbeResult]:
+    """
+    Send one probe message and wait for the bot's reply.
+    
+    Args:
+        client: Connected Pyrogram client
+        username: The bot username to probe
+        max_wait: Seconds to wait for a reply
+        sampler: Optional network baseline sampler to attach to the result
+        number: Position of the probe in its batch, for log output
+        
+    Returns:
+        The probe result, or None if shutdown interrupted the wait
+    """
+    msg_text = generate_random_message()
+    logger.info(f"🔹 [{username}] Sending message #{number}: {msg_text}")
+    probe_started = time.monotonic()
+    if live_metrics:
+        live_metrics.probe_started(username)
+    try:
+        with stage_timers.stage("send"):
+            sent_msg = await client.send_message(username, msg_text)
+        sent_time = sent_msg.date.timestamp()
+
+        check_interval = 0.5
+        waited = 0
+        response_time = None
+        client_latency = None
+
+        with stage_timers.stage("await_reply"):
+            while not response_time and waited < max_wait and not shutdown_event.is_set():
+                await asyncio.sleep(check_interval)
+                waited += check_interval
+            
+                try:
+                    with stage_timers.stage("match"):
+                        async for message in client.get_chat_history(username, limit=10):
+                            if is_reply_to(message, sent_msg, username):
+                                response_time = message.date.timestamp()
+                                client_latency = time.monotonic() - probe_started
+                                last_reply_ids[username] = message.id
+                                break
+                except RPCError as e:
+                    logger.warning(f"⚠️ [{username}] Error fetching chat history: {e}")
+                    break
+
+        if not response_time and shutdown_event.is_set():
+            return None
+
+        with stage_timers.stage("record"):
+            result = ProbeResult(
+                bot=username,
+                message=msg_text,
+                latency=response_time - sent_time if response_time else None,
+                client_latency=client_latency,
+                threshold=CONFIG["response_threshold_seconds"],
+                timeout=max_wait,
+                loop_lag=lag_monitor.max_since(probe_started),
+            )
+            if sampler:
+                baseline = sampler.snapshot()
+                result.baseline_rtt = baseline.rtt
+                result.baseline_ack = baseline.ack
+                result.infra_degraded = baseline.degraded
+        record_probe(result)
+        if result.timed_out:
+            await skip_late_reply(client, username, sent_msg, CONFIG["max_wait_seconds"])
+        return result
+    finally:
+        if live_metrics:
+            live_metrics.probe_finished(username)
+
+async def skip_late_reply(client: Client, username: str, sent_msg, wait: float):
+    """
+    After a missed reply, keep watching for it for up to ``wait`` seconds.
+    
+    A late reply is logged and marked as seen, so it cannot be taken as the
+    answer to the next probe.
+    """
+    check_interval = 0.5
+    waited = 0
+    while waited < wait and not shutdown_event.is_set():
+        await asyncio.sleep(check_interval)
+        waited += check_interval
+        try:
+            async for message in client.get_chat_history(username, limit=10):
+                if is_reply_to(message, sent_msg, username):
+                    last_reply_ids[username] = message.id
+                    late = message.date.timestamp() - sent_msg.date.timestamp()
+                    logger.info(f"🕰️ [{username}] Late reply after {late:.0f}s, not counted for the next probe")
+                    return
+        except RPCError as e:
+            logger.warning(f"⚠️ [{username}] Error fetching chat history: {e}")
+            return
+
+def log_batch_diagnostics(
+    username: str,
+    sampler: Optional[BaselineSampler],
+    degraded_probes: int,
+    adjusted_latencies: List[float]
+):
+    """Log the network baseline and self-instrumentation summary for a batch."""
+    if sampler:
+        baseline = sampler.snapshot()
+        rtt = f"{baseline.rtt_median * 1000:.0f}ms" if baseline.rtt_median is not None else "n/a"
+        ack = f"{baseline.ack_median:.2f}s" if baseline.ack_median is not None else "n/a"
+        adjusted = f"{statistics.median(adjusted_latencies):.2f}s" if adjusted_latencies else "n/a"
+        logger.info(
+            f"🌐 [{username}] Network baseline: median rtt {rtt}, median ack {ack}, "
+            f"median latency without network rtt {adjusted} (client clock), "
+            f"probes during degraded network: {degraded_probes}"
+        )
+    logger.info(f"⏱️ [{username}] Stage timings: {stage_timers.summary()}")
+    logger.info(f"🐢 [{username}] Max event loop lag: {lag_monitor.max_lag * 1000:.0f}ms")
+
+async def run_probe_batch(client: Client, username: str, sampler: Optional[BaselineSampler]) -> int:
+    """
+    Run one adaptive batch of probes against a single bot.
+    
+    Returns:
+        Number of slow responses detected
+    """
+    slow_responses = 0
+    degraded_probes = 0
+    adjusted_latencies: List[float] = []
+    end_time = datetime.now() + timedelta(minutes=CONFIG["duration_minutes"])
+    message_sent = 0
+
+    batch = batch_controller.start_batch(username)
+
+    while (datetime.now() < end_time and 
+           (batch.should_continue() or batch_controller.extend(batch)) and 
+           not shutdown_event.is_set()):
+        
+        try:
+            # Wait for a response up to the bot's current timeout
+            result = await send_probe(
+                client, username, batch_controller.timeout_for(username), sampler, message_sent + 1
+            )
+            if result:
+                if result.slow:
+                    slow_responses += 1
+                if result.infra_degraded:
+                    degraded_probes += 1
+                if result.adjusted_latency is not None:
+                    adjusted_latencies.append(result.adjusted_latency)
+                batch_controller.record(batch, result)
+
+            message_sent += 1
+            
+            # Random delay between messages to avoid rate limiting
+            if not shutdown_event.is_set():
+                delay = random.uniform(2, 5)
+                await asyncio.sleep(delay)
+                
+        except FloodWait as e:
+            logger.warning(f"🚦 [{username}] Rate limited. Waiting {e.value} seconds...")
+            if live_metrics:
+                live_metrics.flood_wait(username, e.value)
+            await asyncio.sleep(e.value)
+        except RPCError as e:
+            logger.error(f"❌ [{username}] Telegram API error: {e}")
+            break
+        except Exception as e:
+            logger.error(f"❌ [{username}] Unexpected error sending message: {e}")
+            break
+
+    batch_controller.finish_batch(batch)
+    logger.info(f"🔚 [{username}] Finished. Sent: {message_sent}, Slow responses (> {CONFIG['response_threshold_seconds']}s): {slow_responses}")
+    log_batch_diagnostics(username, sampler, degraded_probes, adjusted_latencies)
+    return slow_responses
+
+async def send_probe_pair(
+    client: Client,
+    bots: List[str],
+    max_wait: float,
+    sampler: Optional[BaselineSampler],
+    number: int
+) -> List[Optional[ProbeResult]]:
+    """
+    Probe both bots of a pair concurrently.
+    
+    If either probe raises, the other is cancelled before it records a result,
+    so a dropped pair never reaches the detectors, stores or alerts one-sided.
+    """
+    tasks = [asyncio.create_task(send_probe(client, bot, max_wait, sampler, number)) for bot in bots]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    failed = [task for task in tasks if task in done and task.exception()]
+    if failed:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise failed[0].exception()
+    return [task.result() for task in tasks]
+
+async def run_comparison_batch(
+    client: Client,
+    baseline_bot: str,
+    candidate_bot: str,
+    sampler: Optional[BaselineSampler]
+) -> int:
+    """
+    Run one batch of time-paired probes against a baseline and a candidate bot.
+    
+    Both probes of a pair are sent concurrently over the same connection, in
+    random order, so network and data centre noise affects them equally and
+    cancels out in the paired difference.
+    
+    Returns:
+        Number of slow responses detected from the candidate
+    """
+    slow_responses = 0
+    degraded_probes = 0
+    adjusted_latencies: List[float] = []
+    end_time = datetime.now() + timedelta(minutes=CONFIG["duration_minutes"])
+    pairs_sent = 0
+    max_wait = CONFIG["max_wait_seconds"]
+    batch_comparison = PairedComparison(baseline_bot, candidate_bot)
+
+    while (datetime.now() < end_time and 
+           pairs_sent < CONFIG["message_count"] and 
+           not shutdown_event.is_set()):
+        
+        try:
+            order = [baseline_bot, candidate_bot]
+            random.shuffle(order)
+            results = await send_probe_pair(client, order, max_wait, sampler, pairs_sent + 1)
+            paired = dict(zip(order, results))
+            baseline_result = paired[baseline_bot]
+            candidate_result = paired[candidate_bot]
+            
+            if baseline_result and candidate_result:
+                batch_comparison.add(baseline_result, candidate_result)
+                comparison.add(baseline_result, candidate_result)
+                if candidate_result.slow:
+                    slow_responses += 1
+                if candidate_result.infra_degraded:
+                    degraded_probes += 1
+                if candidate_result.adjusted_latency is not None:
+                    adjusted_latencies.append(candidate_result.adjusted_latency)
+
+            pairs_sent += 1
+            
+            # Random delay between pairs to avoid rate limiting
+            if not shutdown_event.is_set():
+                delay = random.uniform(2, 5)
+                await asyncio.sleep(delay)
+                
+        except FloodWait as e:
+            logger.warning(f"🚦 [{candidate_bot}] Rate limited. Waiting {e.value} seconds...")
+            if live_metrics:
+                for bot in (baseline_bot, candidate_bot):
+                    live_metrics.flood_wait(bot, e.value)
+            await asyncio.sleep(e.value)
+        except RPCError as e:
+            logger.error(f"❌ [{candidate_bot}] Telegram API error: {e}")
+            break
+        except Exception as e:
+            logger.error(f"❌ [{candidate_bot}] Unexpected error sending message: {e}")
+            break
+
+    logger.info(f"🔚 [{candidate_bot}] Finished. Pairs sent: {pairs_sent}, Slow candidate responses (> {CONFIG['response_threshold_seconds']}s): {slow_responses}")
+    logger.info(f"🆚 Batch: {batch_comparison.summary()}")
+    logger.info(f"🆚 Cumulative: {comparison.summary()}")
+    log_batch_diagnostics(candidate_bot, sampler, degraded_probes, adjusted_latencies)
+    return slow_responses
+
 # ----- MAIN CHECK FUNCTION -----
-async def monitor_bot_responses(username: str) -> int:
+async def monitor_bot_responses(username: str, candidate: Optional[str] = None) -> int:
     """
     Monitor bot response times for a specific username.
     
     Args:
         username: The bot username to monitor
+        candidate: Optional candidate bot to compare against ``username``
         
     Returns:
         Number of slow responses detected
     """
     client = None
+    sampler = None
     session_path = get_session_path(username)
     session_exists = check_existing_session(username)
     
@@ -173,6 +650,9 @@ async def monitor_bot_responses(username: str) -> int:
         logger.info(f"�🔗 [{username}] Connecting to Telegram...")
         await client.start()
         logger.info(f"✅ [{username}] Successfully connected to Telegram")
+        if dashboard and not dashboard.running:
+            set_console_logging(False)
+            dashboard.start()
         
         # Verify session is working by getting basic info
         try:
@@ -181,70 +661,14 @@ async def monitor_bot_responses(username: str) -> int:
         except Exception as e:
             logger.warning(f"⚠️ [{username}] Could not get user info: {e}")
         
-        slow_responses = 0
-        end_time = datetime.now() + timedelta(minutes=CONFIG["duration_minutes"])
-        message_sent = 0
-
-        while (datetime.now() < end_time and 
-               message_sent < CONFIG["message_count"] and 
-               not shutdown_event.is_set()):
-            
-            try:
-                msg_text = generate_random_message()
-                logger.info(f"🔹 [{username}] Sending message #{message_sent + 1}: {msg_text}")
-                
-                sent_msg = await client.send_message(username, msg_text)
-                sent_time = sent_msg.date.timestamp()
-
-                # Wait up to 10s for response
-                max_wait = 10
-                check_interval = 0.5
-                waited = 0
-                response_time = None
-
-                while not response_time and waited < max_wait and not shutdown_event.is_set():
-                    await asyncio.sleep(check_interval)
-                    waited += check_interval
-                    
-                    try:
-                        async for message in client.get_chat_history(username, limit=10):
-                            if message.id != sent_msg.id and message.date.timestamp() > sent_time:
-                                response_time = message.date.timestamp()
-                                break
-                    except RPCError as e:
-                        logger.warning(f"⚠️ [{username}] Error fetching chat history: {e}")
-                        break
-
-                if response_time:
-                    diff = response_time - sent_time
-                    if diff > CONFIG["response_threshold_seconds"]:
-                        slow_responses += 1
-                        logger.warning(f"🐌 [{username}] Slow response ({diff:.2f}s) for message '{msg_text}'")
-                    else:
-                        logger.info(f"⚡ [{username}] Fast response time: {diff:.2f}s")
-                else:
-                    if not shutdown_event.is_set():
-                        logger.warning(f"❌ [{username}] No response within 10s for message '{msg_text}'")
-
-                message_sent += 1
-                
-                # Random delay between messages to avoid rate limiting
-                if not shutdown_event.is_set():
-                    delay = random.uniform(2, 5)
-                    await asyncio.sleep(delay)
-                    
-            except FloodWait as e:
-                logger.warning(f"🚦 [{username}] Rate limited. Waiting {e.value} seconds...")
-                await asyncio.sleep(e.value)
-            except RPCError as e:
-                logger.error(f"❌ [{username}] Telegram API error: {e}")
-                break
-            except Exception as e:
-                logger.error(f"❌ [{username}] Unexpected error sending message: {e}")
-                break
-
-        logger.info(f"🔚 [{username}] Finished. Sent: {message_sent}, Slow responses (> {CONFIG['response_threshold_seconds']}s): {slow_responses}")
-        return slow_responses
+        if baseline_sampler:
+            sampler = baseline_sampler
+            sampler.attach(client)
+            sampler.start()
+
+        if candidate:
+            return await run_comparison_batch(client, username, candidate, sampler)
+        return await run_probe_batch(client, username, sampler)
         
     except AuthKeyUnregistered:
         logger.error(f"❌ [{username}] Authentication failed. Please check your API credentials.")
@@ -262,6 +686,8 @@ async def monitor_bot_responses(username: str) -> int:
         logger.error(f"❌ [{username}] Unexpected error during monitoring: {e}")
         return -1
     finally:
+        if sampler:
+            await sampler.stop()
         if client:
             try:
                 await client.stop()
@@ -272,6 +698,7 @@ async def monitor_bot_responses(username: str) -> int:
 # ----- LOOP LOGIC -----
 async def main_loop():
     """Main monitoring loop with error handling and graceful shutdown."""
+    global rollup_store, agent, alert_dispatcher, dashboard
     start_time = time.time()
     loop_count = 0
 
@@ -280,25 +707,84 @@ async def main_loop():
                 f"Messages per batch: {CONFIG['message_count']}, "
                 f"Duration: {CONFIG['duration_minutes']} minutes, "
                 f"Loop: {CONFIG['loop']}")
+    if comparison:
+        logger.info(f"🆚 Comparison mode: candidate {CONFIG['candidate_bot_username']} "
+                    f"vs baseline {CONFIG['target_bot_username']}")
+
+    lag_monitor.start()
+    if live_metrics:
+        # Started by monitor_bot_responses once connected, so login prompts stay readable
+        dashboard = Dashboard(
+            live_metrics,
+            loop_lag=lambda: lag_monitor.last_lag,
+            fps=CONFIG["dashboard_fps"],
+            threshold=CONFIG["response_threshold_seconds"]
+        )
 
     try:
+        if CONFIG["rollup_store"]:
+            rollup_store = RollupStore(CONFIG["rollup_db_path"], CONFIG["retention_days"])
+            logger.info(f"💾 Recording probes and rollups to {CONFIG['rollup_db_path']}")
+
+        if CONFIG["agent_mode"]:
+            agent = AgentShipper(
+                CONFIG["aggregator_host"],
+                CONFIG["aggregator_port"],
+                CONFIG["vantage_name"],
+                flush_seconds=CONFIG["agent_flush_seconds"],
+                max_samples=CONFIG["agent_max_samples"],
+                token=CONFIG["aggregator_token"]
+            )
+            agent.start()
+
+        alert_sinks = create_alert_sinks()
+        if alert_sinks:
+            alert_dispatcher = AlertDispatcher(
+                alert_sinks,
+                window_seconds=CONFIG["alert_window_seconds"],
+                confirm_windows=CONFIG["alert_confirm_windows"],
+                flap_threshold=CONFIG["alert_flap_threshold"],
+                flap_window_seconds=CONFIG["alert_flap_window_minutes"] * 60
+            )
+            alert_dispatcher.start()
+
         while not shutdown_event.is_set():
             logger.info(f"🌀 Starting batch loop #{loop_count + 1}")
+            stage_timers.reset()
+            lag_monitor.reset_max()
 
-            # Monitor single bot
-            slow_responses = await monitor_bot_responses(CONFIG["target_bot_username"])
+            # Monitor single bot, or compare it against the candidate
+            slow_responses = await monitor_bot_responses(
+                CONFIG["target_bot_username"],
+                candidate=CONFIG["candidate_bot_username"] or None
+            )
             
             if slow_responses == -1:
                 logger.error("💥 Critical error occurred. Stopping monitoring.")
                 break
 
-            logger.info(
-                f"📊 [{CONFIG['target_bot_username']}] Batch #{loop_count + 1} Result: "
-                f"{slow_responses} slow responses out of {CONFIG['message_count']} messages."
-            )
+            if comparison:
+                logger.info(
+                    f"📊 [{CONFIG['candidate_bot_username']}] Batch #{loop_count + 1} Result: "
+                    f"{slow_responses} slow candidate responses. {comparison.verdict().capitalize()}."
+                )
+            else:
+                logger.info(
+                    f"📊 [{CONFIG['target_bot_username']}] Batch #{loop_count + 1} Result: "
+                    f"{slow_responses} slow responses out of "
+                    f"{batch_controller.last_batches[CONFIG['target_bot_username']].sent} messages."
+                )
 
             loop_count += 1
 
+            if rollup_store:
+                try:
+                    evicted = rollup_store.evict()
+                    if evicted:
+                        logger.info(f"🧹 Evicted {evicted} expired rows from the rollup store")
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️ Could not evict expired rows from the rollup store: {e}")
+
             # Check various exit conditions
             if not CONFIG["loop"]:
                 logger.info("🔁 Loop disabled in configuration. Exiting.")
@@ -335,6 +821,16 @@ async def main_loop():
     except Exception as e:
         logger.error(f"💥 Unexpected error in main loop: {e}")
     finally:
+        if dashboard:
+            await dashboard.stop()
+            set_console_logging(True)
+        await lag_monitor.stop()
+        if agent:
+            await agent.stop()
+        if alert_dispatcher:
+            await alert_dispatcher.stop()
+        if rollup_store:
+            rollup_store.close()
         total_runtime = (time.time() - start_time) / 3600
         logger.info(f"🏁 Monitor stopped. Total runtime: {total_runtime:.2f} hours, Completed batches: {loop_count}")
 
@@ -356,6 +852,8 @@ def main():
         else:
             logger.info(f"🔑 No existing session found for {target_username} - first-time login required")
             logger.info("📱 You will need to enter your phone number and verification code")
+            if live_metrics:
+                logger.info("🖥️ The dashboard will start once login has completed")
         
         # Check if .env file exists
         if not os.path.exists('.env'):
@@ -367,6 +865,14 @@ def main():
             logger.error("❌ Cannot create or access session directory. Exiting.")
             sys.exit(1)
         
+        if CONFIG["use_uvloop"]:
+            install_uvloop()
+        
+        SamplingProfiler(
+            output_dir=CONFIG["profile_dir"],
+            duration=CONFIG["profile_seconds"]
+        ).install()
+        
         # Run the main loop
         asyncio.run(main_loop())
         
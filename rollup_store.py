@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Rollup store for Telegram Bot Response Monitor
+Keeps raw probe results and incrementally maintained minute, hour and day
+rollups of mergeable latency histograms in SQLite, with retention-based
+eviction, so long-horizon percentile queries read pre-aggregated rows.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from histogram import LatencyHistogram
+from metrics import ProbeResult
+
+# Bucket width in seconds for each rollup resolution (aligned to UTC)
+RESOLUTIONS = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+DEFAULT_DB_PATH = "bot_latency.db"
+DEFAULT_RETENTION_DAYS = {
+    "raw": 7,
+    "minute": 2,
+    "hour": 90,
+    "day": 730,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    ts REAL NOT NULL,
+    bot TEXT NOT NULL,
+    latency REAL,
+    baseline_rtt REAL,
+    baseline_ack REAL,
+    infra_degraded INTEGER NOT NULL DEFAULT 0,
+    loop_lag REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS probes_bot_ts ON probes (bot, ts);
+CREATE INDEX IF NOT EXISTS probes_ts ON probes (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    bot TEXT NOT NULL,
+    histogram TEXT NOT NULL,
+    PRIMARY KEY (resolution, bot, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    bot TEXT PRIMARY KEY,
+    first_live REAL,
+    backfilled_until REAL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO coverage (bot, first_live) SELECT bot, MIN(ts) FROM probes GROUP BY bot;
+"""
+
+RollupKey = Tuple[str, int, str]
+
+
+def bucket_start(timestamp: float, resolution: str) -> int:
+    """Start of the rollup bucket containing ``timestamp``."""
+    width = RESOLUTIONS[resolution]
+    return int(timestamp // width) * width
+
+
+class RollupStore:
+    """SQLite-backed raw probe log with incremental histogram rollups."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH, retention_days: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.retention_days = dict(DEFAULT_RETENTION_DAYS, **(retention_days or {}))
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, result: ProbeResult):
+        """Store one probe result and fold it into every rollup."""
+        self.add_many([result])
+
+    def add_many(self, results: Iterable[ProbeResult], keep_raw: bool = True):
+        """Store probe results, merging them into each rollup bucket once."""
+        with self.connection:
+            self._write(results, keep_raw)
+
+    def backfill(self, results: Iterable[ProbeResult]) -> Tuple[int, int]:
+        """Fold historical probes into the rollups, skipping ones already covered.
+
+        Per bot, only probes newer than the last backfill and older than the
+        first live probe are imported, so re-reading a grown or rotated log
+        and history the monitor already recorded are both skipped. Everything
+        is committed in one transaction, so an interrupted backfill can simply
+        be repeated. Returns the number of probes imported and skipped.
+        """
+        counts = {"imported": 0, "skipped": 0}
+        newest: Dict[str, float] = {}
+
+        def uncovered(coverage: Dict[str, Tuple[Optional[float], Optional[float]]]):
+            for result in results:
+                first_live, backfilled_until = coverage.get(result.bot, (None, None))
+                if ((backfilled_until is not None and result.timestamp <= backfilled_until)
+                        or (first_live is not None and result.timestamp >= first_live)):
+                    counts["skipped"] += 1
+                    continue
+                counts["imported"] += 1
+                newest[result.bot] = max(result.timestamp, newest.get(result.bot, result.timestamp))
+                yield result
+
+        with self.connection:
+            coverage = {
+                bot: (first_live, backfilled_until)
+                for bot, first_live, backfilled_until in self.connection.execute(
+                    "SELECT bot, first_live, backfilled_until FROM coverage"
+                )
+            }
+            self._write(uncovered(coverage), keep_raw=False)
+            self.connection.executemany(
+                "INSERT INTO coverage (bot, backfilled_until) VALUES (?, ?) "
+                "ON CONFLICT (bot) DO UPDATE SET backfilled_until = "
+                "MAX(COALESCE(backfilled_until, excluded.backfilled_until), excluded.backfilled_until)",
+                newest.items(),
+            )
+        return counts["imported"], counts["skipped"]
+
+    def _write(self, results: Iterable[ProbeResult], keep_raw: bool):
+        rows = []
+        pending: Dict[RollupKey, LatencyHistogram] = {}
+        for result in results:
+            if keep_raw:
+                rows.append((
+                    result.timestamp, result.bot, result.latency, result.baseline_rtt,
+                    result.baseline_ack, int(result.infra_degraded), result.loop_lag,
+                ))
+            for resolution in RESOLUTIONS:
+                key = (resolution, bucket_start(result.timestamp, resolution), result.bot)
+                histogram = pending.get(key)
+                if histogram is None:
+                    histogram = pending[key] = LatencyHistogram()
+                histogram.add(result.latency)
+
+        if rows:
+            self.connection.executemany(
+                "INSERT INTO probes (ts, bot, latency, baseline_rtt, baseline_ack, infra_degraded, loop_lag) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            # Backfills stop at each bot's first live probe
+            first_live: Dict[str, float] = {}
+            for ts, bot, *_ in rows:
+                first_live[bot] = min(ts, first_live.get(bot, ts))
+            self.connection.executemany(
+                "INSERT INTO coverage (bot, first_live) VALUES (?, ?) "
+                "ON CONFLICT (bot) DO UPDATE SET first_live = COALESCE(first_live, excluded.first_live)",
+                first_live.items(),
+            )
+        for (resolution, bucket, bot), histogram in pending.items():
+            existing = self.connection.execute(
+                "SELECT histogram FROM rollups WHERE resolution = ? AND bot = ? AND bucket = ?",
+                (resolution, bot, bucket),
+            ).fetchone()
+            if existing:
+                histogram.merge(LatencyHistogram.from_dict(json.loads(existing[0])))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO rollups (resolution, bucket, bot, histogram) VALUES (?, ?, ?, ?)",
+                (resolution, bucket, bot, json.dumps(histogram.to_dict(), separators=(",", ":"))),
+            )
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """Delete raw probes and rollups older than their retention period."""
+        now = time.time() if now is None else now
+        deleted = 0
+        with self.connection:
+            cutoff = now - self.retention_days["raw"] * 86400
+            deleted += self.connection.execute("DELETE FROM probes WHERE ts < ?", (cutoff,)).rowcount
+            for resolution in RESOLUTIONS:
+                cutoff = now - self.retention_days[resolution] * 86400
+                deleted += self.connection.execute(
+                    "DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (resolution, cutoff)
+                ).rowcount
+        return deleted
+
+    def query(
+        self,
+        bot: str,
+        resolution: str,
+        since: float,
+        until: Optional[float] = None,
+    ) -> List[Tuple[int, LatencyHistogram]]:
+        """Histograms for ``bot`` per ``resolution`` bucket between ``since`` and ``until``."""
+        until = time.time() if until is None else until
+        rows = self.connection.execute(
+            "SELECT bucket, histogram FROM rollups "
+            "WHERE resolution = ? AND bot = ? AND bucket >= ? AND bucket <= ? ORDER BY bucket",
+            (resolution, bot, bucket_start(since, resolution), until),
+        ).fetchall()
+        return [(bucket, LatencyHistogram.from_dict(json.loads(data))) for bucket, data in rows]
+
+    def bots(self) -> List[str]:
+        """All bots with rollup data."""
+        rows = self.connection.execute("SELECT DISTINCT bot FROM rollups ORDER BY bot").fetchall()
+        return [row[0] for row in rows]
+
+
+def import_columnar(store: RollupStore, columnar_dir: str) -> Tuple[int, int]:
+    """Backfill rollups from a store written by ``analyze_logs.py --columnar``.
+
+    Probes the store already covers are skipped (see ``RollupStore.backfill``),
+    so importing the same or a longer log again only adds what is new. Returns
+    the number of probes imported and skipped.
+    """
+    from analyze_logs import read_columnar
+
+    return store.backfill(
+        ProbeResult(bot=bot, message="", timestamp=timestamp, latency=latency)
+        for timestamp, bot, latency in read_columnar(columnar_dir)
+    )
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}"
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Query latency rollups recorded by res_bot.py.")
+    parser.add_argument("bot", nargs="?", help="Bot to report (default: all bots)")
+    parser.add_argument("--db", default=os.getenv("ROLLUP_DB_PATH", DEFAULT_DB_PATH), help="SQLite database path")
+    parser.add_argument("--resolution", choices=list(RESOLUTIONS), default="hour", help="Rollup bucket size")
+    parser.add_argument("--days", type=float, default=1, help="How many days back to report")
+    parser.add_argument("--import-columnar", metavar="DIR", help="Backfill rollups from analyze_logs.py --columnar output")
+    args = parser.parse_args()
+
+    store = RollupStore(args.db)
+    if args.import_columnar:
+        imported, skipped = import_columnar(store, args.import_columnar)
+        print(f"💾 Imported {imported} probes from {args.import_columnar}")
+        if skipped:
+            print(f"⏭️ Skipped {skipped} probes the store already covers")
+        return
+
+    bots = [args.bot if args.bot.startswith("@") else f"@{args.bot}"] if args.bot else store.bots()
+    if not bots:
+        print("📭 No rollups found.")
+        sys.exit(1)
+
+    since = time.time() - args.days * 86400
+    for bot in bots:
+        started = time.perf_counter()
+        buckets = store.query(bot, args.resolution, since)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"\n🤖 {bot} - {len(buckets)} {args.resolution} buckets ({elapsed:.1f}ms)")
+        print(f"{'bucket (UTC)':<17} {'probes':>7} {'no reply':>8} {'p50':>6} {'p95':>6} {'p99':>6}")
+        for bucket, histogram in buckets:
+            label = datetime.fromtimestamp(bucket, timezone.utc).strftime("%Y-%m-%d %H:%M")
+            print(
+                f"{label:<17} {histogram.count + histogram.timeouts:>7} {histogram.timeouts:>8} "
+                f"{format_seconds(histogram.percentile(50)):>6} {format_seconds(histogram.percentile(95)):>6} "
+                f"{format_seconds(histogram.percentile(99)):>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
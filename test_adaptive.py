@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive batch sizing and timeouts
+"""
+
+from adaptive import DEGRADED, HEALTHY, UNDECIDED, AdaptiveBatchController, AdaptiveTimeout, SequentialBatch
+from metrics import ProbeResult
+
+
+def probe(latency, bot="@bot", threshold=5.0):
+    return ProbeResult(bot=bot, message="test", latency=latency, threshold=threshold)
+
+
+def new_batch(early_stop=True):
+    return SequentialBatch("@bot", base_probes=20, min_probes=5, healthy_bad_rate=0.05,
+                           degraded_bad_rate=0.5, early_stop=early_stop)
+
+
+def test_healthy_bot_stops_early():
+    """Consistently fast replies reach a healthy verdict well before the batch limit."""
+    batch = new_batch()
+    while batch.should_continue():
+        batch.record(probe(0.5))
+    assert batch.decision == HEALTHY
+    assert 5 <= batch.sent < 20
+
+
+def test_degraded_bot_stops_early():
+    """Timeouts and slow replies reach a degraded verdict."""
+    batch = new_batch()
+    while batch.should_continue():
+        batch.record(probe(None if batch.sent % 2 else 8.0))
+    assert batch.decision == DEGRADED
+    assert batch.sent < 20
+
+
+def test_no_decision_before_min_probes():
+    batch = new_batch()
+    for _ in range(4):
+        batch.record(probe(None))
+    assert batch.decision == UNDECIDED
+    assert batch.should_continue()
+
+
+def test_early_stop_disabled_runs_full_batch():
+    batch = new_batch(early_stop=False)
+    while batch.should_continue():
+        batch.record(probe(0.5))
+    assert batch.decision == UNDECIDED
+    assert batch.sent == 20
+
+
+def test_finish_batch_credits_only_decided_batches():
+    controller = AdaptiveBatchController(base_probes=20)
+
+    decided = controller.start_batch("@bot")
+    while decided.should_continue():
+        controller.record(decided, probe(0.5))
+    controller.finish_batch(decided)
+    assert controller.spare_probes == 20 - decided.sent
+
+    spare = controller.spare_probes
+    undecided = controller.start_batch("@bot")
+    undecided.sent = 10
+    controller.finish_batch(undecided)
+    assert controller.spare_probes == spare
+
+
+def test_extend_spends_budget_on_undecided_batches_only():
+    controller = AdaptiveBatchController(base_probes=4, min_probes=2)
+    controller.spare_probes = 10
+
+    batch = controller.start_batch("@bot")
+    assert not controller.extend(batch)  # limit not reached yet
+    batch.sent = batch.limit
+    assert controller.extend(batch)
+    assert batch.limit == 5 and controller.spare_probes == 9
+
+    batch.decision = HEALTHY
+    batch.sent = batch.limit
+    assert not controller.extend(batch)
+
+
+def test_extend_is_capped_at_twice_the_base_batch():
+    controller = AdaptiveBatchController(base_probes=4, min_probes=2)
+    controller.spare_probes = 100
+    batch = controller.start_batch("@bot")
+    while True:
+        batch.sent = batch.limit
+        if not controller.extend(batch):
+            break
+    assert batch.limit == 8
+
+
+def test_adaptive_timeout_tracks_latency_and_backs_off():
+    timeout = AdaptiveTimeout(initial=10.0, minimum=2.0, maximum=10.0)
+    for _ in range(50):
+        timeout.record(1.0)
+    assert timeout.timeout == 2.0  # converged srtt + 4 * rttvar, clamped to the minimum
+
+    timeout.record(None)
+    assert timeout.timeout == 4.0
+    for _ in range(5):
+        timeout.record(None)
+    assert timeout.timeout == 10.0
+
+
+def test_whole_second_latency_keeps_one_second_of_margin():
+    """Identical whole-second replies collapse rttvar; the clock granularity remains."""
+    timeout = AdaptiveTimeout(initial=30.0, minimum=1.0, maximum=30.0)
+    for _ in range(50):
+        timeout.record(6.0)
+    assert timeout.rttvar < 0.01
+    assert abs(timeout.timeout - 7.0) < 0.01
+
+
+def test_controller_uses_max_wait_without_adaptive_timeouts():
+    controller = AdaptiveBatchController(base_probes=5, max_wait=10.0, adaptive_timeouts=False)
+    batch = controller.start_batch("@bot")
+    controller.record(batch, probe(0.1))
+    assert controller.timeout_for("@bot") == 10.0
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the multi-vantage aggregator and its wire format
+"""
+
+import asyncio
+import json
+import time
+import zlib
+
+import pytest
+
+import aggregator
+from aggregator import FRAME_HEADER, AgentBatch, Aggregator, read_frame
+from metrics import ProbeResult
+
+
+def frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def read(data: bytes):
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_frame(reader)
+
+    return asyncio.run(scenario())
+
+
+def batch_message(seq=1, session="s1", results=()):
+    batch = AgentBatch(max_samples=10)
+    for result in results:
+        batch.add(result)
+    message = batch.to_message("eu-west", session, seq)
+    # What the aggregator receives after a JSON round trip
+    return json.loads(json.dumps(message))
+
+
+def probes(count, latency=0.5, start=None):
+    start = time.time() if start is None else start
+    return [ProbeResult(bot="@bot", message="x", timestamp=start + i, latency=latency) for i in range(count)]
+
+
+def test_frame_round_trip():
+    message = {"type": "query", "window_minutes": 5}
+    assert read(frame(zlib.compress(json.dumps(message).encode()))) == message
+
+
+def test_oversized_frame_is_rejected_before_reading():
+    with pytest.raises(ValueError):
+        read(FRAME_HEADER.pack(aggregator.MAX_FRAME_BYTES + 1))
+
+
+def test_decompression_bomb_is_rejected(monkeypatch):
+    monkeypatch.setattr(aggregator, "MAX_DECOMPRESSED_BYTES", 1024)
+    payload = zlib.compress(json.dumps({"padding": "x" * 10000}).encode())
+    with pytest.raises(ValueError):
+        read(frame(payload))
+
+
+def test_truncated_stream_and_non_object_are_rejected():
+    payload = zlib.compress(json.dumps({"type": "batch"}).encode())
+    with pytest.raises(ValueError):
+        read(frame(payload[:-4]))
+    with pytest.raises(ValueError):
+        read(frame(zlib.compress(b"[1, 2]")))
+
+
+def test_token_is_checked_when_configured():
+    assert Aggregator().authorized({})
+    secured = Aggregator(token="s3cret")
+    assert secured.authorized({"token": "s3cret"})
+    assert not secured.authorized({"token": "wrong"})
+    assert not secured.authorized({"token": ["s3cret"]})
+
+
+def test_resent_batch_is_merged_once():
+    agg = Aggregator()
+    message = batch_message(results=probes(3))
+    assert agg.merge(message)
+    assert not agg.merge(message)
+    assert agg.view()["global"]["@bot"]["probes"] == 3
+
+
+def test_malformed_histogram_leaves_state_untouched():
+    agg = Aggregator()
+    message = batch_message(results=probes(3))
+    (bucket,) = message["histograms"]["@bot"]
+    message["histograms"]["@bot"][bucket]["count"] = "3"
+    with pytest.raises(ValueError):
+        agg.merge(message)
+    assert agg.buckets == {} and agg.last_seq == {}
+
+    # The corrected resend with the same sequence number is still accepted
+    assert agg.merge(batch_message(results=probes(3)))
+
+
+@pytest.mark.parametrize("field, value", [
+    ("buckets", {"100": -1}),
+    ("total", float("nan")),
+    ("min", "0.5"),
+    ("count", 7),
+])
+def test_histogram_fields_are_validated(field, value):
+    message = batch_message(results=probes(3))
+    (bucket,) = message["histograms"]["@bot"]
+    message["histograms"]["@bot"][bucket][field] = value
+    with pytest.raises(ValueError):
+        Aggregator().merge(message)
+
+
+def test_outage_widens_buckets_without_losing_probes():
+    batch = AgentBatch(max_samples=10, max_buckets=8)
+    start = 1_700_000_000 // 3600 * 3600
+    for minute in range(60):
+        batch.add(ProbeResult(bot="@bot", message="x", timestamp=start + minute * 60, latency=0.5))
+    assert len(batch.histograms["@bot"]) <= 8
+    assert batch.bucket_seconds == 480
+    assert len(batch) == 60
+
+    agg = Aggregator()
+    agg.merge(json.loads(json.dumps(batch.to_message("eu-west", "s1", 1))))
+    assert sum(h.count for h in agg.buckets.values()) == 60
+    assert set(agg.bucket_seconds.values()) == {480}
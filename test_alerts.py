@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for alert grouping, flap suppression and delivery
+"""
+
+import asyncio
+
+from alerts import (
+    DOWN, FLAPPING, OK, SLOW, TELEGRAM_MAX_MESSAGE_LENGTH, Alert, AlertDispatcher, AlertSink, DeliveryRejected,
+    TelegramSink, text_length,
+)
+from metrics import ProbeResult
+
+# (probes, slow, timeouts) of a window in each state
+WINDOWS = {OK: (10, 0, 0), SLOW: (10, 6, 0), DOWN: (10, 0, 10)}
+
+
+def run_windows(dispatcher, states, bot="@bot"):
+    alerts = []
+    for number, state in enumerate(states):
+        alert = dispatcher._update_state(bot, *WINDOWS[state], number * 60.0, (number + 1) * 60.0)
+        alerts.append(alert)
+    return alerts
+
+
+def test_window_classification():
+    dispatcher = AlertDispatcher([])
+    assert dispatcher._window_state(*WINDOWS[OK]) == OK
+    assert dispatcher._window_state(*WINDOWS[SLOW]) == SLOW
+    assert dispatcher._window_state(*WINDOWS[DOWN]) == DOWN
+
+
+def test_state_change_needs_confirmation():
+    dispatcher = AlertDispatcher([], confirm_windows=2)
+    alerts = run_windows(dispatcher, [DOWN, OK, DOWN, DOWN, DOWN])
+    assert [alert and alert.state for alert in alerts] == [None, None, None, DOWN, None]
+    assert alerts[3].previous_state == OK
+
+
+def test_four_transitions_produce_one_flapping_alert():
+    dispatcher = AlertDispatcher([], confirm_windows=1, flap_threshold=4)
+    alerts = run_windows(dispatcher, [DOWN, OK, DOWN, OK, DOWN, OK, DOWN])
+    states = [alert.state for alert in alerts if alert]
+    assert states == [DOWN, OK, DOWN, FLAPPING]
+    assert dispatcher.states["@bot"].flapping
+
+
+def test_flapping_bot_reports_when_stable_again():
+    dispatcher = AlertDispatcher([], confirm_windows=1, flap_threshold=4, flap_window_seconds=600)
+    run_windows(dispatcher, [DOWN, OK, DOWN, OK])
+    assert dispatcher.states["@bot"].flapping
+
+    alerts = [
+        dispatcher._update_state("@bot", *WINDOWS[OK], start, start + 60)
+        for start in (600.0, 1200.0)
+    ]
+    assert alerts[0] is None  # transitions still inside the flap window
+    assert alerts[1].state == OK and alerts[1].previous_state == FLAPPING
+    assert not dispatcher.states["@bot"].flapping
+
+
+def test_evaluate_window_groups_probes_per_bot():
+    async def scenario():
+        dispatcher = AlertDispatcher([], confirm_windows=1)
+        for _ in range(5):
+            dispatcher.observe(ProbeResult(bot="@down", message="x", latency=None))
+            dispatcher.observe(ProbeResult(bot="@fine", message="x", latency=0.5, threshold=5.0))
+        dispatcher._evaluate_window()
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert dispatcher.states["@down"].state == DOWN
+    assert dispatcher.states["@fine"].state == OK
+    assert dispatcher.queue.empty()
+
+
+class RecordingSink(AlertSink):
+    name = "recording"
+
+    def __init__(self, error=None):
+        self.error = error
+        self.attempts = 0
+
+    async def send(self, alerts):
+        self.attempts += 1
+        if self.error:
+            raise self.error
+
+
+def test_rejected_deliveries_are_not_retried(monkeypatch):
+    rejected = RecordingSink(DeliveryRejected("HTTP 400"))
+    failing = RecordingSink(ConnectionError("reset"))
+    working = RecordingSink()
+    dispatcher = AlertDispatcher([rejected, failing, working], max_retries=2)
+    alert = Alert("@bot", DOWN, OK, "summary", 0.0, 60.0)
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr("alerts.asyncio.sleep", no_sleep)
+    asyncio.run(dispatcher._deliver([alert]))
+    assert (rejected.attempts, failing.attempts, working.attempts) == (1, 2, 1)
+
+
+def test_telegram_messages_stay_within_the_length_limit():
+    sink = TelegramSink("token", "42")
+    alerts = [Alert(f"@bot{i}", DOWN, OK, "10 of 10 probes missed", 0.0, 60.0) for i in range(200)]
+    payloads = sink.payloads(alerts)
+    assert len(payloads) > 1
+    assert all(text_length(p["text"]) <= TELEGRAM_MAX_MESSAGE_LENGTH for p in payloads)
+    lines = [line for p in payloads for line in p["text"].split("\n")]
+    assert lines == [alert.text() for alert in alerts]
+    assert {p["chat_id"] for p in payloads} == {"42"}
+
+
+def test_oversized_alert_is_cut_into_several_messages():
+    sink = TelegramSink("token", "42")
+    alert = Alert("@bot", DOWN, OK, "🔴" * 5000, 0.0, 60.0)
+    payloads = sink.payloads([alert])
+    assert all(text_length(p["text"]) <= TELEGRAM_MAX_MESSAGE_LENGTH for p in payloads)
+    assert "".join(p["text"] for p in payloads) == alert.text()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the log history analyzer
+"""
+
+import gzip
+import os
+
+from analyze_logs import analyze, plan_chunks, read_columnar, scan_chunk
+
+LINES = [
+    "2025-07-03 19:41:54,123 - INFO - ⚡ [@fast_bot] Fast response time: 0.85s",
+    "2025-07-03 19:42:03,456 - WARNING - 🐌 [@slow_bot] Slow response (6.12s) for message 'xY7nQ2vF'",
+    "2025-07-03 19:42:15,789 - WARNING - ❌ [@slow_bot] No response within 10s for message 'aB3kM9pL'",
+    "2025-07-03 19:42:16,001 - INFO - 🔹 [@fast_bot] Sending message #2: qwertyui",
+    "2025-07-03 20:00:01,002 - INFO - ⚡ [@fast_bot] Fast response time: 1.25s",
+]
+
+
+def write_log(path, repeat=200):
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(repeat):
+            f.write("\n".join(LINES) + "\n")
+    return str(path)
+
+
+def totals(histograms):
+    result = {}
+    for (bot, _), histogram in histograms.items():
+        probes, timeouts = result.get(bot, (0, 0))
+        result[bot] = (probes + histogram.count + histogram.timeouts, timeouts + histogram.timeouts)
+    return result
+
+
+def test_chunks_cover_file_on_line_boundaries(tmp_path):
+    path = write_log(tmp_path / "bot.log")
+    chunks = plan_chunks(path, 1000)
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0 and chunks[-1][1] == os.path.getsize(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    for (start, end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert end == next_start
+        assert data[end - 1:end] == b"\n"
+
+
+def test_chunk_split_mid_file_counts_every_line(tmp_path):
+    """Chunks far smaller than the file still find each probe line exactly once."""
+    path = write_log(tmp_path / "bot.log")
+    counted = {}
+    for start, end in plan_chunks(path, 777):
+        histograms, _ = scan_chunk((path, start, end, None))
+        for bot, (probes, timeouts) in totals(histograms).items():
+            seen = counted.get(bot, (0, 0))
+            counted[bot] = (seen[0] + probes, seen[1] + timeouts)
+    assert counted == {"@fast_bot": (400, 0), "@slow_bot": (400, 200)}
+
+
+def test_lines_are_bucketed_by_hour(tmp_path):
+    path = write_log(tmp_path / "bot.log", repeat=1)
+    histograms, _ = scan_chunk((path, 0, os.path.getsize(path), None))
+    assert set(histograms) == {
+        ("@fast_bot", "2025-07-03 19:00"),
+        ("@fast_bot", "2025-07-03 20:00"),
+        ("@slow_bot", "2025-07-03 19:00"),
+    }
+    assert histograms[("@slow_bot", "2025-07-03 19:00")].percentile(50) == 6.12
+
+
+def test_gzip_and_plain_logs_agree(tmp_path):
+    plain = write_log(tmp_path / "bot.log")
+    compressed = str(tmp_path / "bot.log.1.gz")
+    with open(plain, "rb") as src, gzip.open(compressed, "wb") as dst:
+        dst.write(src.read())
+    assert totals(analyze([plain], 2, 1000)) == totals(analyze([compressed], 2, 1000))
+
+
+def test_columnar_round_trip(tmp_path):
+    path = write_log(tmp_path / "bot.log", repeat=3)
+    columnar_dir = str(tmp_path / "columns")
+    analyze([path], 2, 300, columnar_dir)
+    rows = list(read_columnar(columnar_dir))
+    assert len(rows) == 12
+    assert sorted({bot for _, bot, _ in rows}) == ["@fast_bot", "@slow_bot"]
+    assert sum(latency is None for _, _, latency in rows) == 3
+    latencies = sorted(round(latency, 2) for _, _, latency in rows if latency is not None)
+    assert latencies == [0.85] * 3 + [1.25] * 3 + [6.12] * 3
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming latency anomaly detection
+"""
+
+import random
+import time
+
+from anomaly import AnomalyDetectors, LatencyAnomalyDetector
+from metrics import ProbeResult
+
+NOW = time.time()
+
+
+def feed(detector, latencies, timeout=None):
+    anomalies = []
+    for latency in latencies:
+        anomalies.extend(detector.observe(latency, NOW, timeout))
+    return anomalies
+
+
+def steady(count, centre=1.0, seed=1):
+    rng = random.Random(seed)
+    return [centre * rng.uniform(0.8, 1.2) for _ in range(count)]
+
+
+def test_stable_latency_raises_nothing():
+    detector = LatencyAnomalyDetector("@bot")
+    assert feed(detector, steady(300)) == []
+
+
+def test_noisy_lognormal_latency_raises_nothing():
+    """A wide but stationary distribution is not mistaken for a regression."""
+    rng = random.Random(4)
+    detector = LatencyAnomalyDetector("@bot")
+    assert feed(detector, [rng.lognormvariate(0, 0.5) for _ in range(3000)], timeout=5.0) == []
+
+
+def test_whole_second_latency_raises_nothing():
+    """Reply dates have one-second resolution, so latencies are mostly 0.0 or 1.0."""
+    rng = random.Random(5)
+    for share in (0.03, 0.3):
+        detector = LatencyAnomalyDetector("@bot")
+        latencies = [1.0 if rng.random() < share else 0.0 for _ in range(3000)]
+        assert feed(detector, latencies) == []
+
+
+def test_whole_second_regression_is_reported():
+    rng = random.Random(6)
+    detector = LatencyAnomalyDetector("@bot")
+    feed(detector, [float(rng.random() < 0.3) for _ in range(200)])
+    anomalies = feed(detector, [3.0 + (rng.random() < 0.3) for _ in range(20)])
+    assert sorted(anomaly.kind for anomaly in anomalies) == ["change_point", "p95_regression"]
+
+
+def test_no_alerts_during_warmup():
+    detector = LatencyAnomalyDetector("@bot", warmup=30)
+    assert feed(detector, steady(20) + [9.0] * 9) == []
+
+
+def test_regression_reported_once():
+    """A sustained slowdown is reported once per kind, not once per probe."""
+    detector = LatencyAnomalyDetector("@bot")
+    feed(detector, steady(200))
+    anomalies = feed(detector, steady(40, centre=4.0, seed=2))
+    kinds = sorted(anomaly.kind for anomaly in anomalies)
+    assert kinds == ["change_point", "p95_regression"]
+    assert all(anomaly.recent_p95 > anomaly.baseline_p95 for anomaly in anomalies)
+
+
+def test_single_timeout_does_not_alert():
+    detector = LatencyAnomalyDetector("@bot")
+    feed(detector, steady(200))
+    assert feed(detector, [None] + steady(10, seed=3), timeout=5.0) == []
+
+
+def test_timeout_counts_as_probe_wait_time():
+    detector = LatencyAnomalyDetector("@bot", timeout_value=10.0)
+    detector.observe(None, NOW, 4.0)
+    assert list(detector.recent) == [4.0]
+    detector.observe(None, NOW)
+    assert list(detector.recent) == [4.0, 10.0]
+
+
+def test_registry_keeps_one_detector_per_bot():
+    detectors = AnomalyDetectors(warmup=5)
+    detectors.observe(ProbeResult(bot="@a", message="x", latency=1.0))
+    detectors.observe(ProbeResult(bot="@b", message="x", latency=None, timeout=3.0))
+    assert set(detectors.detectors) == {"@a", "@b"}
+    assert list(detectors.get("@b").recent) == [3.0]
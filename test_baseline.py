@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the network baseline sampler
+"""
+
+import asyncio
+
+from pyrogram.errors import FloodWait
+
+from baseline import MIN_SAMPLES_FOR_MEDIAN, BaselineSampler
+
+
+class SentMessage:
+    id = 1
+
+
+class FakeClient:
+    """Stands in for a Pyrogram client: counts calls and raises queued errors."""
+
+    def __init__(self, ping_errors=(), send_errors=()):
+        self.ping_errors = list(ping_errors)
+        self.send_errors = list(send_errors)
+        self.pings = 0
+        self.sends = 0
+        self.deleted = []
+
+    async def invoke(self, query):
+        self.pings += 1
+        if self.ping_errors:
+            raise self.ping_errors.pop(0)
+
+    async def send_message(self, chat_id, text):
+        self.sends += 1
+        if self.send_errors:
+            raise self.send_errors.pop(0)
+        return SentMessage()
+
+    async def delete_messages(self, chat_id, message_ids):
+        self.deleted.append(message_ids)
+
+
+def test_degraded_and_recovered_transitions():
+    sampler = BaselineSampler(None, "@bot", slow_seconds=1.0)
+    for _ in range(MIN_SAMPLES_FOR_MEDIAN):
+        sampler._update(0.1, 0.2)
+    assert not sampler.snapshot().degraded
+
+    sampler._update(2.5, None)
+    assert sampler.snapshot().degraded
+    assert sampler.snapshot().ack == 0.2  # a missing sample keeps the last value
+
+    sampler._update(0.1, 0.2)
+    assert not sampler.snapshot().degraded
+
+
+def test_median_needs_minimum_samples():
+    sampler = BaselineSampler(None, "@bot", slow_seconds=1.0, slow_factor=3.0)
+    for _ in range(MIN_SAMPLES_FOR_MEDIAN - 1):
+        sampler._update(0.1, None)
+    assert sampler.snapshot().rtt_median is None
+
+    # Three times the median only counts once the median is trusted
+    sampler._update(0.5, None)
+    snapshot = sampler.snapshot()
+    assert snapshot.rtt_median == 0.1
+    assert snapshot.degraded
+
+
+def test_flood_wait_pauses_ack_probes():
+    client = FakeClient(send_errors=[FloodWait(value=60)])
+    sampler = BaselineSampler(client, "@bot")
+
+    async def scenario():
+        await sampler.sample_once()
+        await sampler.sample_once()
+
+    asyncio.run(scenario())
+    assert (client.pings, client.sends) == (2, 1)
+    assert sampler.snapshot().ack is None
+
+
+def test_ack_message_is_deleted():
+    client = FakeClient()
+    sampler = BaselineSampler(client, "@bot")
+    asyncio.run(sampler.sample_once())
+    assert client.deleted == [SentMessage.id]
+    assert sampler.snapshot().ack is not None
+
+
+def test_connection_errors_do_not_stop_sampling():
+    client = FakeClient(ping_errors=[ConnectionError("reset"), OSError("unreachable")])
+    sampler = BaselineSampler(client, "@bot", interval=0.01, ack_probes=False)
+
+    async def scenario():
+        sampler.start()
+        await asyncio.sleep(0.1)
+        await sampler.stop()
+
+    asyncio.run(scenario())
+    assert client.pings > 2
+    assert sampler.snapshot().rtt is not None
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for paired canary comparison statistics
+"""
+
+import math
+import random
+import statistics
+
+from comparison import PairedComparison, RunningStats, t_critical
+from metrics import ProbeResult
+
+
+def pair(baseline_latency, candidate_latency):
+    return (ProbeResult(bot="@base", message="x", latency=baseline_latency),
+            ProbeResult(bot="@cand", message="x", latency=candidate_latency))
+
+
+def test_running_stats_match_statistics_module():
+    values = [0.8, 1.3, 0.9, 2.4, 1.1, 0.7]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    assert math.isclose(stats.mean, statistics.mean(values))
+    low, high = stats.confidence_interval()
+    half_width = t_critical(len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values))
+    assert math.isclose(high - low, 2 * half_width)
+
+
+def test_confidence_interval_needs_two_samples():
+    stats = RunningStats()
+    stats.add(1.0)
+    assert stats.confidence_interval() is None
+
+
+def test_t_critical_approaches_normal():
+    assert t_critical(1) == 12.706
+    assert abs(t_critical(31) - 2.040) < 0.01
+    assert abs(t_critical(1000) - 1.96) < 0.01
+
+
+def test_shared_noise_cancels_out():
+    """A 0.2s slowdown is detected even when both bots share large network noise."""
+    rng = random.Random(7)
+    comparison = PairedComparison("@base", "@cand")
+    for _ in range(40):
+        network = rng.uniform(0.0, 3.0)
+        comparison.add(*pair(1.0 + network, 1.2 + network + rng.gauss(0, 0.05)))
+    low, high = comparison.differences.confidence_interval()
+    assert 0 < low < 0.2 < high
+    assert comparison.verdict() == "candidate slower"
+
+
+def test_identical_bots_show_no_difference():
+    rng = random.Random(3)
+    comparison = PairedComparison("@base", "@cand")
+    for _ in range(40):
+        network = rng.uniform(0.0, 3.0)
+        comparison.add(*pair(1.0 + network + rng.gauss(0, 0.05), 1.0 + network + rng.gauss(0, 0.05)))
+    assert comparison.verdict() == "no significant difference"
+
+
+def test_pairs_with_a_timeout_are_counted_but_not_compared():
+    comparison = PairedComparison("@base", "@cand")
+    comparison.add(*pair(1.0, None))
+    comparison.add(*pair(None, 1.0))
+    comparison.add(*pair(1.0, 1.5))
+    assert comparison.pairs == 3
+    assert comparison.candidate_timeouts == 1 and comparison.baseline_timeouts == 1
+    assert comparison.differences.n == 1
+    assert comparison.verdict() == "insufficient data"
+    assert "1 complete pairs of 3" in comparison.summary()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the live terminal dashboard
+"""
+
+import io
+import re
+
+from dashboard import BotMetrics, Dashboard, LiveMetrics, sparkline
+from metrics import ProbeResult
+
+# 2025-07-03 19:41:00 UTC, on a minute boundary
+T0 = 1751571660.0
+
+
+def probe(bot, latency, offset=0.0):
+    return ProbeResult(bot=bot, message="x", timestamp=T0 + offset, latency=latency, threshold=5.0)
+
+
+class FixedClock:
+    """Stands in for ``datetime`` so the header clock does not tick during a test."""
+
+    @staticmethod
+    def now():
+        return FixedClock()
+
+    def strftime(self, fmt):
+        return "12:00:00"
+
+
+def make_dashboard(monkeypatch, bots=("@a", "@b", "@c")):
+    monkeypatch.setattr("dashboard.time.time", lambda: T0 + 30)
+    monkeypatch.setattr("dashboard.datetime", FixedClock)
+    metrics = LiveMetrics(window_minutes=5)
+    for number, bot in enumerate(bots):
+        metrics.record(probe(bot, 1.0 + number))
+    stream = io.StringIO()
+    return Dashboard(metrics, lambda: 0.0, stream=stream), metrics, stream
+
+
+def written_lines(stream):
+    """Terminal rows (1-based) that a frame moved the cursor to and rewrote."""
+    return {int(row) for row in re.findall(r"\x1b\[(\d+);1H", stream.getvalue())}
+
+
+def test_only_changed_lines_are_rewritten(monkeypatch):
+    dashboard, metrics, stream = make_dashboard(monkeypatch)
+    dashboard.draw()
+    first = dashboard._previous
+    assert len(written_lines(stream)) == len(first)
+
+    stream.seek(0)
+    stream.truncate()
+    metrics.record(probe("@a", 1.5, offset=10))
+    dashboard.draw()
+    changed = {index + 1 for index, (old, new) in enumerate(zip(first, dashboard._previous)) if old != new}
+    # Only the header (probe count) and @a's row changed
+    assert len(changed) == 2
+    assert written_lines(stream) == changed
+
+
+def test_unchanged_frame_writes_nothing(monkeypatch):
+    dashboard, _, stream = make_dashboard(monkeypatch)
+    dashboard.draw()
+    stream.seek(0)
+    stream.truncate()
+    dashboard.draw()
+    assert stream.getvalue() == ""
+
+
+def test_only_dirty_rows_are_recomputed(monkeypatch):
+    dashboard, metrics, _ = make_dashboard(monkeypatch)
+    refreshed = []
+    original = Dashboard._refresh_row
+
+    def counting_refresh(self, bot, bot_metrics, now_minute):
+        refreshed.append(bot)
+        original(self, bot, bot_metrics, now_minute)
+
+    monkeypatch.setattr(Dashboard, "_refresh_row", counting_refresh)
+    dashboard.frame()
+    assert sorted(refreshed) == ["@a", "@b", "@c"]
+
+    refreshed.clear()
+    metrics.probe_started("@b")
+    dashboard.frame()
+    assert refreshed == ["@b"]
+
+
+def test_every_row_is_refreshed_when_the_minute_changes(monkeypatch):
+    dashboard, _, _ = make_dashboard(monkeypatch)
+    dashboard.frame()
+    refreshed = []
+    monkeypatch.setattr(Dashboard, "_refresh_row", lambda self, bot, *args: refreshed.append(bot))
+    monkeypatch.setattr("dashboard.time.time", lambda: T0 + 90)
+    dashboard.frame()
+    assert sorted(refreshed) == ["@a", "@b", "@c"]
+
+
+def test_rolling_window_drops_old_minutes():
+    metrics = BotMetrics(window_minutes=5)
+    for minute in range(8):
+        metrics.add(probe("@a", float(minute + 1), offset=minute * 60))
+    now_minute = int(T0 // 60) + 7
+    window = metrics.window(now_minute)
+    # Minutes 3..7 remain, latencies 4.0..8.0
+    assert (window.count, window.minimum, window.maximum) == (5, 4.0, 8.0)
+
+    # Two idle minutes later only minutes 5..7 are still inside the window
+    window = metrics.window(now_minute + 2)
+    assert (window.count, window.minimum) == (3, 6.0)
+
+
+def test_sparkline_marks_timeouts_and_scales_to_maximum():
+    assert sparkline([0.0, None, 4.0, 2.0]) == "▁✗█▄"
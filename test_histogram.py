@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the mergeable latency histogram
+"""
+
+import json
+import math
+import random
+
+from histogram import LatencyHistogram
+
+
+def exact_percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * q / 100)) - 1]
+
+
+def test_percentiles_within_bucket_error():
+    rng = random.Random(11)
+    values = [rng.lognormvariate(0, 0.8) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    histogram.add_all(values)
+    for q in (50, 90, 95, 99):
+        exact = exact_percentile(values, q)
+        assert abs(histogram.percentile(q) - exact) / exact < 0.02
+
+
+def test_merge_equals_single_histogram():
+    rng = random.Random(5)
+    values = [rng.uniform(0.1, 8.0) for _ in range(1000)] + [None] * 7
+    whole = LatencyHistogram()
+    whole.add_all(values)
+    left, right = LatencyHistogram(), LatencyHistogram()
+    left.add_all(values[:400])
+    right.add_all(values[400:])
+    merged = left.merge(right)
+    assert merged.buckets == whole.buckets
+    assert (merged.count, merged.timeouts) == (whole.count, whole.timeouts)
+    assert (merged.minimum, merged.maximum) == (whole.minimum, whole.maximum)
+    assert math.isclose(merged.total, whole.total)
+
+
+def test_merge_into_empty_histogram():
+    histogram = LatencyHistogram()
+    histogram.add(2.5)
+    merged = LatencyHistogram().merge(histogram)
+    assert merged.percentile(50) == 2.5
+    assert merged.minimum == merged.maximum == 2.5
+
+
+def test_timeouts_are_counted_separately():
+    histogram = LatencyHistogram()
+    histogram.add_all([None, None, 1.0])
+    assert histogram.timeouts == 2 and histogram.count == 1
+    assert histogram.percentile(99) == 1.0
+    assert histogram.mean == 1.0
+
+
+def test_empty_histogram_has_no_percentiles():
+    histogram = LatencyHistogram()
+    histogram.add(None)
+    assert histogram.percentile(50) is None
+    assert histogram.mean is None
+
+
+def test_dict_round_trip_through_json():
+    histogram = LatencyHistogram()
+    histogram.add_all([0.0005, 0.3, 1.7, 9.9, None])
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.buckets == histogram.buckets
+    assert restored.to_dict() == histogram.to_dict()
+    assert restored.percentile(95) == histogram.percentile(95)
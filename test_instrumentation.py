@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the monitor's self-instrumentation
+"""
+
+import os
+import time
+
+from instrumentation import LoopLagMonitor, SamplingProfiler, StageTimers
+
+
+def test_max_since_only_looks_at_newer_samples():
+    monitor = LoopLagMonitor(window=3)
+    for ts, lag in [(10.0, 0.9), (20.0, 0.2), (30.0, 0.4), (40.0, 0.1)]:
+        monitor.samples.append((ts, lag))
+    assert monitor.max_since(25.0) == 0.4
+    assert monitor.max_since(40.0) == 0.1
+    assert monitor.max_since(50.0) == 0.0
+    # The 0.9s lag fell out of the window
+    assert monitor.max_since(0.0) == 0.4
+
+
+def test_nested_stages_are_timed_separately():
+    timers = StageTimers()
+    for _ in range(2):
+        with timers.stage("outer"):
+            with timers.stage("inner"):
+                time.sleep(0.01)
+    assert timers.counts == {"inner": 2, "outer": 2}
+    assert timers.totals["outer"] >= timers.totals["inner"] >= 0.02
+    summary = timers.summary()
+    assert summary.startswith("inner avg") and ", outer avg" in summary
+
+    timers.reset()
+    assert timers.summary() == "no samples"
+
+
+def test_stage_is_recorded_when_the_block_raises():
+    timers = StageTimers()
+    try:
+        with timers.stage("send"):
+            raise ConnectionError("reset")
+    except ConnectionError:
+        pass
+    assert timers.counts == {"send": 1}
+
+
+def busy_loop(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(100))
+
+
+def test_profiler_writes_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), duration=0.2, rate_hz=200)
+    assert profiler.start()
+    assert not profiler.start()  # one profile at a time
+    busy_loop(0.3)
+    profiler._thread.join(timeout=5)
+
+    (name,) = os.listdir(tmp_path)
+    assert name.endswith(".folded")
+    with open(tmp_path / name) as f:
+        lines = f.read().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and stack
+    assert any("busy_loop (test_instrumentation.py" in line for line in lines)
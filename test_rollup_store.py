@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite rollup store
+"""
+
+import time
+
+from analyze_logs import analyze
+from metrics import ProbeResult
+from rollup_store import RollupStore, bucket_start, import_columnar
+
+# 2025-07-03 19:41:00 UTC, on a minute boundary
+T0 = 1751571660.0
+
+
+def probe(offset, latency, bot="@bot"):
+    return ProbeResult(bot=bot, message="x", timestamp=T0 + offset, latency=latency)
+
+
+def test_bucket_start_aligns_to_resolution():
+    assert bucket_start(T0 + 59, "minute") == T0
+    assert bucket_start(T0, "hour") == T0 - 41 * 60
+    assert bucket_start(T0, "day") % 86400 == 0
+
+
+def test_add_many_builds_every_resolution(tmp_path):
+    store = RollupStore(str(tmp_path / "probes.db"))
+    store.add_many([probe(0, 1.0), probe(30, 2.0), probe(90, None), probe(3600, 3.0)])
+
+    minutes = store.query("@bot", "minute", T0, T0 + 7200)
+    assert [(bucket, h.count, h.timeouts) for bucket, h in minutes] == [
+        (T0, 2, 0), (T0 + 60, 0, 1), (T0 + 3600, 1, 0),
+    ]
+    hours = store.query("@bot", "hour", T0, T0 + 7200)
+    assert [(h.count, h.timeouts) for _, h in hours] == [(2, 1), (1, 0)]
+    (_, day), = store.query("@bot", "day", T0, T0 + 7200)
+    assert (day.count, day.timeouts, day.maximum) == (3, 1, 3.0)
+    assert store.bots() == ["@bot"]
+
+
+def test_incremental_adds_merge_into_existing_buckets(tmp_path):
+    store = RollupStore(str(tmp_path / "probes.db"))
+    store.add(probe(0, 1.0))
+    store.add(probe(10, 5.0))
+    (_, minute), = store.query("@bot", "minute", T0, T0 + 60)
+    assert minute.count == 2
+    assert (minute.minimum, minute.maximum) == (1.0, 5.0)
+
+
+def test_evict_applies_retention_per_table(tmp_path):
+    store = RollupStore(str(tmp_path / "probes.db"), {"raw": 1, "minute": 1, "hour": 10, "day": 100})
+    store.add_many([probe(0, 1.0), probe(5 * 86400, 2.0)])
+    now = T0 + 5 * 86400 + 60
+
+    deleted = store.evict(now)
+    assert deleted == 2  # one raw probe and one minute bucket
+    raw = store.connection.execute("SELECT COUNT(*) FROM probes").fetchone()[0]
+    assert raw == 1
+    assert len(store.query("@bot", "minute", T0, now)) == 1
+    assert len(store.query("@bot", "hour", T0, now)) == 2
+
+
+LOG_LINES = (
+    "2025-07-03 19:41:54,123 - INFO - ⚡ [@bot] Fast response time: 0.85s\n"
+    "2025-07-03 19:42:15,789 - WARNING - ❌ [@bot] No response within 10s for message 'aB3kM9pL'\n"
+)
+
+
+def backfill_log(store, tmp_path, text):
+    log = tmp_path / "bot.log"
+    log.write_text(text, encoding="utf-8")
+    columnar_dir = str(tmp_path / "columns")
+    analyze([str(log)], 1, 1000, columnar_dir)
+    return import_columnar(store, columnar_dir)
+
+
+def test_import_columnar_is_idempotent(tmp_path):
+    store = RollupStore(str(tmp_path / "probes.db"))
+    assert backfill_log(store, tmp_path, LOG_LINES * 50) == (100, 0)
+    assert backfill_log(store, tmp_path, LOG_LINES * 50) == (0, 100)
+
+    (_, day), = store.query("@bot", "day", 0, 2 ** 40)
+    assert (day.count, day.timeouts) == (50, 50)
+
+
+def test_reimporting_a_grown_log_adds_only_new_lines(tmp_path):
+    store = RollupStore(str(tmp_path / "probes.db"))
+    backfill_log(store, tmp_path, LOG_LINES * 50)
+    grown = LOG_LINES * 50 + "2025-07-03 19:45:00,000 - INFO - ⚡ [@bot] Fast response time: 1.50s\n" * 10
+    assert backfill_log(store, tmp_path, grown) == (10, 100)
+
+    (_, day), = store.query("@bot", "day", 0, 2 ** 40)
+    assert day.count + day.timeouts == 110
+
+
+def test_backfill_stops_at_first_live_probe(tmp_path):
+    store = RollupStore(str(tmp_path / "probes.db"))
+    # The monitor started recording between the two logged probes
+    live = time.mktime(time.strptime("2025-07-03 19:42:00", "%Y-%m-%d %H:%M:%S"))
+    store.add(ProbeResult(bot="@bot", message="x", timestamp=live, latency=0.85))
+    assert backfill_log(store, tmp_path, LOG_LINES) == (1, 1)
+
+    (_, day), = store.query("@bot", "day", 0, 2 ** 40)
+    assert (day.count, day.timeouts) == (2, 0)